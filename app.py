@@ -1,22 +1,102 @@
+import asyncio
+import cProfile
+import hashlib
+import itertools
 import os
-from datetime import datetime
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-from flask import Flask, render_template, request, redirect, url_for, flash, make_response
+import click
+from flask import (
+    Flask, render_template, request, redirect, url_for, flash, make_response, jsonify, abort,
+    Response, stream_with_context, session, g, has_request_context
+)
+from markupsafe import Markup
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import (
     LoginManager, login_user, login_required, logout_user,
     current_user, UserMixin
 )
-from sqlalchemy import case, desc
+from sqlalchemy import case, delete as delete_rows, event, func, insert, inspect, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
-from utils.metadata_utils import fetch_metadata
-from urllib.parse import quote_plus
+from utils.metadata_utils import (
+    fetch_metadata, fetch_metadata_async, placeholder_metadata, cached_metadata, configure_metadata_cache,
+    metadata_cache, slug_to_title, fetch_threads
+)
+from utils.cache_utils import MemoryCache, SQLCache, canonical_url
+from utils.icon_utils import (configure_icon_cache, resolve_host_icon, download_icon, host_icon_cache, guessed_icon,
+                              cached_host_icon, same_site, raster_type)
+from utils.import_utils import FORMATS as IMPORT_FORMATS, iter_links
+from utils.pool_utils import HostLimiter, host_of, map_bounded, map_bounded_async
+from utils.export_utils import FORMATS as EXPORT_FORMATS, WRITERS as EXPORT_WRITERS
+from utils.search_utils import SEARCH_PAGE_SIZE, backend_for, include_object
+from utils.metrics_utils import registry, sample_lines, span
+from utils.http_utils import close_async_client, configure_breaker_store
+from utils.provider_utils import route
+from urllib.parse import quote_plus, urlparse
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'example/someday_times.db')
 ENV = os.getenv("FLASK_ENV", "development")
 
+# Background metadata enrichment (see enqueue_enrichment / run_enrichment_worker)
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "2"))   # in-process threads; 0 = external `flask enrich-worker`
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", "3"))
+ENRICH_POLL_SECONDS = 2
+ENRICH_LEASE = timedelta(minutes=5)
+ENRICH_PER_HOST = int(os.getenv("ENRICH_PER_HOST", "2"))  # concurrent fetches per publisher host
+# "threads": ENRICH_WORKERS blocking threads; "async": one event loop thread per
+# process keeping up to ENRICH_CONCURRENCY fetches in flight
+ENRICH_MODE = os.getenv("ENRICH_MODE", "threads")
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "200"))
+ENRICH_DB_THREADS = 4   # async mode: threads running the (blocking) queue queries
+
+BATCH_SAVE_MAX = int(os.getenv("BATCH_SAVE_MAX", "50"))                   # URLs per POST /api/articles:batch
+BATCH_SAVE_CONCURRENCY = int(os.getenv("BATCH_SAVE_CONCURRENCY", "20"))   # fetches in flight per batch
+
+# Metadata repair (see refresh_stale_metadata)
+REFRESH_INTERVAL_HOURS = float(os.getenv("REFRESH_INTERVAL_HOURS", "0"))   # in-process schedule; 0 = use cron
+REFRESH_BATCH = int(os.getenv("REFRESH_BATCH", "500"))      # rows looked at per run
+REFRESH_PER_HOST = 20                                        # of which at most this many per publisher host
+REFRESH_HOST_INTERVAL = float(os.getenv("REFRESH_HOST_INTERVAL", "2"))   # seconds between fetches to one host
+REFRESH_WORKERS = 8
+REFRESH_COMMIT = 50
+REFRESH_MAX_ATTEMPTS = 4
+REFRESH_BACKOFF = timedelta(days=1)   # doubled after each attempt that leaves the row stale
+REFRESH_LEASE = timedelta(hours=1)
+
+IMPORT_BATCH = 500
+EXPORT_BATCH = 500
+
+# Metadata cache backend: "db" shares entries across gunicorn workers, "memory" is per process
+METADATA_CACHE = os.getenv("METADATA_CACHE", "db" if ENV == "production" else "memory")
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "5000"))
+
+PAGE_SIZE = 50
+ROW_CACHE_SIZE = int(os.getenv("ROW_CACHE_SIZE", "2000"))   # rendered article rows kept per process
+ROW_CACHE_TTL = 3600
+PRINCIPAL_TTL = float(os.getenv("PRINCIPAL_TTL", "60"))   # seconds a worker trusts its cached login; 0 = off
+PRINCIPAL_CACHE_SIZE = 10000
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "0"))   # log requests running more statements; 0 = off
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")   # bearer token required by /metrics when set
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))   # fraction of requests run under cProfile
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, 'example/profiles'))
+
+STATS_RECONCILE_HOURS = float(os.getenv("STATS_RECONCILE_HOURS", "0"))   # in-process reconcile interval; 0 = use cron
+
+ICON_REVALIDATE = timedelta(days=1)
+ICON_FETCH_WORKERS = int(os.getenv("ICON_FETCH_WORKERS", "4"))   # background /icon/<host> fetches per process
+ICON_MAX_AGE = 7 * 86400   # browser cache lifetime for /icon/<host>
+HOST_RE = re.compile(r"^(?=.{1,253}$)([a-z0-9-]{1,63}\.)+[a-z]{2,63}$")
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev')
 
@@ -29,7 +109,7 @@ else:
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, include_object=include_object)
 
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -41,39 +121,703 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # bumped by every write to the user's articles; drives ETags and the row cache
+    library_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
+        if self.id is not None:
+            forget_principal(self.id)
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
 
+def _canonical_default(context):
+    return canonical_url(context.get_current_parameters()['url'])
+
+def _favicon_guessed_default(context):
+    params = context.get_current_parameters()
+    if params.get('metadata_status') == 'pending':
+        return True   # a placeholder; enrichment sets the real value
+    return guessed_icon(params.get('favicon_url'))
+
+
 class Article(db.Model):
     __tablename__ = 'articles'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     url = db.Column(db.Text, nullable=False)
+    # duplicate key: one row per (user, canonical_url); filled from url on insert
+    canonical_url = db.Column(db.Text, nullable=False, default=_canonical_default)
     title = db.Column(db.Text, nullable=True)
     publisher = db.Column(db.String(255), nullable=True)
     favicon_url = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     date_read = db.Column(db.DateTime, nullable=True)
 
+    # 'pending' until the enrichment worker has filled in title/publisher/favicon
+    metadata_status = db.Column(db.String(16), nullable=False, default='done', server_default='done')
+    # metadata repair of fallback titles/icons (see refresh_stale_metadata)
+    refresh_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    refresh_after = db.Column(db.DateTime, nullable=True)
+    # no icon, or the /favicon.ico fallback rather than one the site declared;
+    # filled on insert, and kept in step wherever favicon_url is rewritten
+    favicon_guessed = db.Column(db.Boolean, nullable=False, default=_favicon_guessed_default,
+                                server_default='0')
+    # last change to an exported field (the export's `since=` cursor); set on
+    # insert, bumped by toggle, enrichment and metadata repair
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+
     user = db.relationship('User', backref=db.backref('articles', lazy='dynamic'))
 
+    # One partial index per list, matching its keyset order (see PAGED_LISTS)
+    __table_args__ = (
+        db.Index('ix_articles_user_unread', 'user_id', 'created_at', 'id',
+                 postgresql_where=date_read.is_(None), sqlite_where=date_read.is_(None)),
+        db.Index('ix_articles_user_read', 'user_id', 'date_read', 'id',
+                 postgresql_where=date_read.is_not(None), sqlite_where=date_read.is_not(None)),
+        db.Index('ix_articles_user_canonical', 'user_id', 'canonical_url', unique=True),
+        db.Index('ix_articles_user_updated', 'user_id', 'updated_at'),
+    )
+
+
+class MetadataCacheEntry(db.Model):
+    __tablename__ = 'metadata_cache'
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the canonical URL
+    value = db.Column(db.Text, nullable=False)        # JSON
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class HostIcon(db.Model):
+    __tablename__ = 'host_icons'
+    host = db.Column(db.String(255), primary_key=True)
+    icon_url = db.Column(db.Text, nullable=False)
+    content = db.Column(db.LargeBinary, nullable=True)   # None when too large or not fetchable
+    content_type = db.Column(db.String(64), nullable=True)
+    etag = db.Column(db.String(255), nullable=True)
+    checked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 
+def _engine_outside_context():
+    with app.app_context():
+        return db.engine
+
+if METADATA_CACHE == "db":
+    # fetch threads and the async enrichment loop run outside any app context,
+    # so each lookup pushes one; host icons share the table under their own key
+    # namespace
+    configure_metadata_cache(SQLCache(_engine_outside_context, MetadataCacheEntry.__table__))
+    configure_icon_cache(SQLCache(_engine_outside_context, MetadataCacheEntry.__table__))
+    configure_breaker_store(SQLCache(_engine_outside_context, MetadataCacheEntry.__table__))
+else:
+    configure_metadata_cache(MemoryCache(max_size=METADATA_CACHE_SIZE))
+
+
+class EnrichmentJob(db.Model):
+    __tablename__ = 'enrichment_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('articles.id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending | running | done | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserStats(db.Model):
+    """Denormalized per-user counts, adjusted in the same transaction as each write.
+
+    saved_this_week counts articles created since week_start (Monday, UTC);
+    a row whose week_start is stale reads as 0 saved this week.
+    """
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    read = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    saved_this_week = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    week_start = db.Column(db.Date, nullable=True)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+
+
+# current_user resolves from a per-process TTL cache of (id, email), so most
+# requests start without touching the users table. library_version is not in
+# it: it changes on every write, so library_version() reads it when needed.
+
+class Principal(UserMixin):
+    """What current_user is after load_user: the cached part of a User."""
+
+    def __init__(self, id, email):
+        self.id = id
+        self.email = email
+
+principal_cache = MemoryCache(PRINCIPAL_CACHE_SIZE)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    user_id = int(user_id)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        row = db.session.execute(select(User.id, User.email).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        principal = Principal(row.id, row.email)
+        if PRINCIPAL_TTL > 0:
+            principal_cache.set(user_id, principal, PRINCIPAL_TTL)
+    return principal
+
+def forget_principal(user_id):
+    """Drop this worker's cached login; other workers let theirs expire (PRINCIPAL_TTL)."""
+    principal_cache.delete(int(user_id))
 
 def is_htmx():
     return request.headers.get("HX-Request") == "true"
 
+@app.template_global()
+def icon_src(a):
+    """Serve the site icon through /icon/<host>; per-article art (oEmbed thumbnails) stays direct."""
+    host = (urlparse(a.url if "://" in a.url else "https://" + a.url).hostname or "").lower()
+    if not a.favicon_url or not HOST_RE.match(host):
+        return a.favicon_url
+    icon_host = (urlparse(a.favicon_url).hostname or "").lower()
+    if not same_site(host, icon_host):
+        return a.favicon_url
+    return url_for('icon', host=host)
+
+# ---- schema bootstrap ----
+# Development creates tables straight from the models, once per process on the
+# first request (or via `flask init-db`), so the `flask db` commands never race
+# it; a database created this way is stamped at the Alembic head. Production
+# relies on `flask db upgrade` and gunicorn refuses to start if the database is
+# not at the head.
+
+_schema_ready = False
+
+def bootstrap_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    from flask_migrate import stamp
+
+    os.makedirs(os.path.dirname(DEFAULT_DB_PATH), exist_ok=True)
+    with app.app_context():
+        fresh = not inspect(db.engine).get_table_names()
+        db.create_all()
+        with db.engine.begin() as conn:
+            search_backend().install(conn)
+        if fresh:
+            stamp(directory=os.path.join(BASE_DIR, 'migrations'))
+    _schema_ready = True
+
+@app.before_request
+def _bootstrap_schema():
+    if ENV == "development":
+        bootstrap_schema()
+
+# ---- conditional GET / fragment cache ----
+# Pages and fragments are tagged with the user's library_version, so a
+# matching If-None-Match is answered from the users row alone.
+
+def _template_tag():
+    h = hashlib.sha1()
+    for root, _, files in sorted(os.walk(os.path.join(BASE_DIR, 'templates'))):
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:8]
+
+TEMPLATE_TAG = _template_tag()   # a deploy that changes the markup invalidates old ETags
+row_fragments = MemoryCache(ROW_CACHE_SIZE)
+
+def bump_library_version(user_id):
+    """Call inside the transaction that changes the user's articles."""
+    db.session.execute(update(User).where(User.id == user_id)
+                       .values(library_version=User.library_version + 1))
+    if has_request_context():
+        g.pop('library_version', None)   # re-read after the bump
+
+def library_version():
+    """current_user's library_version, read at most once per request (and again after a bump)."""
+    if 'library_version' not in g:
+        # the pages keyed on it also show the counters: load user_stats in the same
+        # round-trip (held on g, as the identity map is weak) so user_summary finds it
+        row = db.session.execute(
+            select(User.library_version, UserStats)
+            .outerjoin(UserStats, UserStats.user_id == User.id)
+            .where(User.id == current_user.id)
+        ).first()
+        g.library_version, g.user_stats = (row.library_version, row.UserStats) if row else (0, None)
+    return g.library_version
+
+def library_etag(*parts):
+    return "-".join(map(str, (TEMPLATE_TAG, current_user.id, library_version()) + parts))
+
+def not_modified(etag):
+    """A 304 for a matching If-None-Match, else None. Pages with pending flash messages always render."""
+    if request.if_none_match.contains(etag) and '_flashes' not in session:
+        resp = make_response('', 304)
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp
+    return None
+
+def tagged(resp, etag):
+    resp = make_response(resp)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+@app.template_global()
+def render_row(a):
+    """partials/article_li.html for `a`, cached per (article id, library version)."""
+    key = (a.id, library_version())
+    html = row_fragments.get(key)
+    if html is None:
+        html = render_template('partials/article_li.html', a=a)
+        row_fragments.set(key, html, ROW_CACHE_TTL)
+    return Markup(html)
+
+# ---- enrichment queue ----
+# Saves insert a placeholder Article plus an EnrichmentJob row; worker threads
+# (or a separate `flask enrich-worker` process) claim jobs from the table and
+# fill in the metadata. Claiming is a conditional UPDATE so several workers
+# and gunicorn processes can share the same queue.
+
+_enrich_wakeup = threading.Event()
+_enrich_started_pid = None
+_enrich_lock = threading.Lock()
+enrich_hosts = HostLimiter(ENRICH_PER_HOST)
+
+def enqueue_enrichment(article):
+    db.session.add(EnrichmentJob(article_id=article.id))
+
+def ensure_enrichment_workers():
+    """Start the in-process worker threads once per process (fork safe)."""
+    global _enrich_started_pid
+    if ENRICH_WORKERS <= 0 or _enrich_started_pid == os.getpid():
+        return
+    with _enrich_lock:
+        if _enrich_started_pid == os.getpid():
+            return
+        _enrich_started_pid = os.getpid()
+        if ENRICH_MODE == "async":
+            threading.Thread(target=run_enrichment_loop, name="enrich-async", daemon=True).start()
+            return
+        for i in range(ENRICH_WORKERS):
+            t = threading.Thread(target=run_enrichment_worker, name=f"enrich-{i}", daemon=True)
+            t.start()
+
+@app.before_request
+def _start_enrichment_workers():
+    # not only on saves: jobs queued before a restart, by `flask import-links
+    # --no-enrich`, or waiting out a retry backoff need a worker too
+    ensure_enrichment_workers()
+
+def claim_enrichment_job():
+    now = datetime.utcnow()
+    candidates = (db.session.query(EnrichmentJob.id)
+                  .filter(or_(
+                      (EnrichmentJob.status == 'pending') & (EnrichmentJob.run_after <= now),
+                      (EnrichmentJob.status == 'running') & (EnrichmentJob.locked_at < now - ENRICH_LEASE),
+                  ))
+                  .order_by(EnrichmentJob.run_after, EnrichmentJob.id)
+                  .limit(5)
+                  .all())
+    for (job_id,) in candidates:
+        claimed = db.session.execute(
+            update(EnrichmentJob)
+            .where(EnrichmentJob.id == job_id,
+                   or_(EnrichmentJob.status == 'pending',
+                       (EnrichmentJob.status == 'running') & (EnrichmentJob.locked_at < now - ENRICH_LEASE)))
+            .values(status='running', locked_at=now, attempts=EnrichmentJob.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(EnrichmentJob, job_id)
+    return None
+
+def start_enrichment_job(job):
+    """(url, host) to fetch for a claimed job, holding a per-host slot, or None
+    when the job was dropped or pushed back instead."""
+    article = db.session.get(Article, job.article_id)
+    if article is None:
+        db.session.delete(job)
+        db.session.commit()
+        return None
+
+    host = host_of(article.url)
+    if not enrich_hosts.acquire(host, timeout=0):
+        # host already has ENRICH_PER_HOST fetches in flight; try again shortly
+        job.status = 'pending'
+        job.attempts -= 1
+        job.run_after = datetime.utcnow() + timedelta(seconds=2)
+        db.session.commit()
+        return None
+    return article.url, host
+
+def finish_enrichment_job(job, result, error=None, commit=True):
+    """Store a fetch_metadata result, or schedule a retry when it raised (`error`).
+    With commit=False the caller commits and bumps the library version."""
+    article = db.session.get(Article, job.article_id)
+    if article is None:
+        return   # deleted while fetching; the job went with it
+    final_attempt = job.attempts >= ENRICH_MAX_ATTEMPTS
+    fallback = placeholder_metadata(article.url)[0]
+    if error is None:
+        title, publisher, favicon = result
+        # fetch_metadata falls back to the bare URL when every strategy failed;
+        # treat that as retryable until the last attempt.
+        if (not title or title == fallback) and not final_attempt:
+            error = RuntimeError("no title found")
+    if error is not None:
+        job.last_error = str(error)[:500]
+        if final_attempt:
+            job.status = 'failed'
+            article.metadata_status = 'failed'
+            if commit:
+                bump_library_version(article.user_id)
+        else:
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=10 * 2 ** job.attempts)
+        if commit:
+            db.session.commit()
+        return
+
+    # keep an imported title rather than replacing it with the bare URL
+    if (title and title != fallback) or not article.title:
+        article.title = title or article.url
+    article.publisher = publisher or '—'
+    article.favicon_url = favicon
+    article.favicon_guessed = guessed_icon(favicon)
+    article.metadata_status = 'done'
+    article.updated_at = datetime.utcnow()
+    job.status = 'done'
+    job.last_error = None
+    if commit:
+        bump_library_version(article.user_id)
+        db.session.commit()
+
+def run_enrichment_job(job):
+    started = start_enrichment_job(job)
+    if not started:
+        return
+    url, host = started
+    try:
+        # retries skip negative cache entries so they actually hit the network again
+        result, error = fetch_metadata(url, allow_negative=job.attempts == 1), None
+    except Exception as e:
+        result, error = None, e
+    finally:
+        enrich_hosts.release(host)
+    finish_enrichment_job(job, result, error)
+
+def run_enrichment_worker(stop=None):
+    with fetch_threads():
+        while not (stop and stop.is_set()):
+            with app.app_context():
+                try:
+                    job = claim_enrichment_job()
+                    if job:
+                        run_enrichment_job(job)
+                        continue
+                except Exception:
+                    app.logger.exception("enrichment worker error")
+                    db.session.rollback()
+            _enrich_wakeup.wait(ENRICH_POLL_SECONDS)
+            _enrich_wakeup.clear()
+
+# Async mode: queue queries stay synchronous and run on a few DB threads, each
+# step in its own app context; only the fetches live on the event loop.
+
+def _in_app_context(fn, *args):
+    with app.app_context():
+        try:
+            return fn(*args)
+        except Exception:
+            app.logger.exception("enrichment worker error")
+            db.session.rollback()
+            return None
+
+def _claim_and_start():
+    """(job id, attempts, url, host) for the next runnable job; False when one was
+    claimed but pushed back, None when the queue is empty."""
+    job = claim_enrichment_job()
+    if job is None:
+        return None
+    started = start_enrichment_job(job)
+    return (job.id, job.attempts) + started if started else False
+
+def _finish_by_id(job_id, result, error):
+    job = db.session.get(EnrichmentJob, job_id)
+    if job is not None:
+        finish_enrichment_job(job, result, error)
+
+async def _run_job_async(run_db, job_id, attempts, url, host):
+    try:
+        result, error = await fetch_metadata_async(url, allow_negative=attempts == 1), None
+    except Exception as e:
+        result, error = None, e
+    finally:
+        enrich_hosts.release(host)
+    await run_db(_finish_by_id, job_id, result, error)
+
+async def _enrichment_loop(stop=None, concurrency=ENRICH_CONCURRENCY):
+    loop = asyncio.get_running_loop()
+    db_threads = ThreadPoolExecutor(max_workers=ENRICH_DB_THREADS, thread_name_prefix="enrich-db")
+    run_db = lambda fn, *args: loop.run_in_executor(db_threads, _in_app_context, fn, *args)
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+
+    async def run(claimed):
+        try:
+            await _run_job_async(run_db, *claimed)
+        finally:
+            slots.release()
+
+    try:
+        while not (stop and stop.is_set()):
+            await slots.acquire()
+            claimed = await run_db(_claim_and_start)
+            if not claimed:
+                slots.release()
+                if claimed is None:
+                    await loop.run_in_executor(None, _enrich_wakeup.wait, ENRICH_POLL_SECONDS)
+                    _enrich_wakeup.clear()
+                continue
+            task = asyncio.create_task(run(claimed))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        await asyncio.gather(*running, return_exceptions=True)
+        await close_async_client()
+        db_threads.shutdown()
+
+def run_enrichment_loop(stop=None, concurrency=ENRICH_CONCURRENCY):
+    """Async mode worker: one thread, up to `concurrency` jobs in flight."""
+    asyncio.run(_enrichment_loop(stop, concurrency))
+
+# ---- metadata repair ----
+# Rows keep whatever enrichment produced, including fallbacks: the bare URL or a
+# URL-slug guess for the title, a DOI for a title when Crossref did not answer,
+# and an icon the site never declared (favicon_guessed). refresh_stale_metadata
+# re-fetches those in small host-grouped, rate-limited runs; each row that stays
+# stale backs off (refresh_after) and is given up on after REFRESH_MAX_ATTEMPTS.
+
+DOI_TITLE = re.compile(r"^10\.\d{4,9}/\S+$")
+
+def title_rank(title, url, publisher):
+    """0 for a missing or URL title, 1 for a DOI or slug guess, 2 for a real title."""
+    if not title or title.startswith(('http://', 'https://')):
+        return 0
+    if DOI_TITLE.match(title) or title == slug_to_title(urlparse(url).path, publisher or ''):
+        return 1
+    return 2
+
+def stale_metadata_query(now):
+    return (Article.query
+            .filter(Article.metadata_status != 'pending',
+                    Article.refresh_attempts < REFRESH_MAX_ATTEMPTS,
+                    or_(Article.refresh_after.is_(None), Article.refresh_after <= now),
+                    or_(Article.title.is_(None), Article.title.like('http://%'), Article.title.like('https://%'),
+                        Article.title.like('10.%/%'), Article.favicon_guessed.is_(True)))
+            .order_by(Article.refresh_after.is_not(None), Article.refresh_after, Article.id))
+
+def claim_stale_articles(limit=REFRESH_BATCH):
+    """Pick up to `limit` stale rows, at most REFRESH_PER_HOST per host, and lease
+    them (refresh_after = now + REFRESH_LEASE) so concurrent runs skip them."""
+    now = datetime.utcnow()
+    per_host, ids = {}, []
+    for a in stale_metadata_query(now).limit(limit * 4):
+        host = host_of(a.url)
+        if per_host.get(host, 0) < REFRESH_PER_HOST:
+            per_host[host] = per_host.get(host, 0) + 1
+            ids.append(a.id)
+            if len(ids) >= limit:
+                break
+    if not ids:
+        return []
+    lease = now + REFRESH_LEASE
+    db.session.execute(
+        update(Article)
+        .where(Article.id.in_(ids), or_(Article.refresh_after.is_(None), Article.refresh_after <= now))
+        .values(refresh_after=lease),
+        execution_options={"synchronize_session": False})
+    db.session.commit()
+    return Article.query.filter(Article.id.in_(ids), Article.refresh_after == lease).all()
+
+def apply_refresh(a, result, now):
+    """Take whatever in `result` beats what `a` has; back off if it is still stale."""
+    changed = False
+    if result:
+        title, publisher, favicon = result
+        if title_rank(title, a.url, publisher) > title_rank(a.title, a.url, a.publisher):
+            a.title, a.publisher, changed = title, publisher or a.publisher, True
+        guessed = guessed_icon(favicon)
+        if favicon and favicon != a.favicon_url and (not guessed or not a.favicon_url):
+            a.favicon_url, a.favicon_guessed, changed = favicon, guessed, True
+        elif favicon and favicon == a.favicon_url and not guessed:
+            a.favicon_guessed = False   # the icon we had is the one the site declares
+    if changed:
+        a.updated_at = now
+        if a.metadata_status == 'failed':
+            a.metadata_status = 'done'
+    if title_rank(a.title, a.url, a.publisher) == 2 and not a.favicon_guessed:
+        a.refresh_attempts, a.refresh_after = 0, None
+    else:
+        a.refresh_attempts += 1
+        a.refresh_after = now + REFRESH_BACKOFF * 2 ** (a.refresh_attempts - 1)
+    return changed
+
+def refresh_stale_metadata(limit=REFRESH_BATCH, progress=None):
+    """One repair run. Fetches each canonical URL once, REFRESH_HOST_INTERVAL apart
+    per host, and commits every REFRESH_COMMIT URLs. Returns (checked, repaired)."""
+    rows = claim_stale_articles(limit)
+    by_key = {}
+    for a in rows:
+        by_key.setdefault(a.canonical_url, []).append(a)
+    # round-robin over hosts so the bounded workers are not all queued on one publisher
+    by_host = {}
+    for key, group in by_key.items():
+        by_host.setdefault(host_of(group[0].url), []).append(group[0].url)
+    urls = [u for batch in itertools.zip_longest(*by_host.values()) for u in batch if u]
+    url_rows = {group[0].url: group for group in by_key.values()}
+
+    checked = repaired = 0
+    users = set()
+    fetch = lambda url: fetch_metadata(url, refresh=True)
+    with fetch_threads(REFRESH_WORKERS):
+        for i, (url, result, error) in enumerate(
+                map_bounded(fetch, urls, workers=REFRESH_WORKERS, per_host=1, interval=REFRESH_HOST_INTERVAL), 1):
+            now = datetime.utcnow()
+            for a in url_rows[url]:
+                checked += 1
+                if apply_refresh(a, None if error else result, now):
+                    repaired += 1
+                    users.add(a.user_id)
+            if i % REFRESH_COMMIT == 0 or i == len(urls):
+                for user_id in users:
+                    bump_library_version(user_id)
+                users.clear()
+                db.session.commit()
+                if progress:
+                    progress(checked, repaired)
+    return checked, repaired
+
+_refresh_started_pid = None
+
+def ensure_metadata_refresher():
+    """Optional in-process periodic repair (REFRESH_INTERVAL_HOURS); cron `flask refresh-metadata` otherwise."""
+    global _refresh_started_pid
+    if REFRESH_INTERVAL_HOURS <= 0 or _refresh_started_pid == os.getpid():
+        return
+    with _enrich_lock:
+        if _refresh_started_pid == os.getpid():
+            return
+        _refresh_started_pid = os.getpid()
+        threading.Thread(target=_run_metadata_refresher, name="metadata-refresh", daemon=True).start()
+
+@app.before_request
+def _start_metadata_refresher():
+    ensure_metadata_refresher()
+
+def _run_metadata_refresher():
+    while True:
+        time.sleep(REFRESH_INTERVAL_HOURS * 3600 * random.uniform(0.9, 1.1))
+        with app.app_context():
+            try:
+                checked, repaired = refresh_stale_metadata()
+                if checked:
+                    app.logger.info("metadata refresh: repaired %d of %d rows", repaired, checked)
+            except Exception:
+                app.logger.exception("metadata refresh failed")
+                db.session.rollback()
+
+# ---- metrics ----
+# Per-process, like /cache/stats: each gunicorn worker exposes its own series.
+
+request_seconds = registry.histogram("someday_request_seconds", "Request latency", ["endpoint"])
+request_queries = registry.histogram("someday_request_sql_queries", "SQL statements per request", ["endpoint"],
+                                     buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+sql_seconds = registry.histogram("someday_sql_query_seconds", "SQL statement latency")
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    sql_seconds.observe(elapsed)
+    if has_request_context() and "sql_queries" in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+def _cache_lines():
+    caches = {"metadata": metadata_cache.stats.as_dict(), "icon": host_icon_cache.stats.as_dict()}
+    yield from sample_lines("someday_cache_hit_ratio", "gauge", "Share of lookups served from the cache",
+                            [({"cache": name}, st["hit_ratio"]) for name, st in caches.items()])
+    yield from sample_lines("someday_cache_lookups_total", "counter", "Cache lookups by result",
+                            [({"cache": name, "result": r}, st[r]) for name, st in caches.items()
+                             for r in ("hits", "negative_hits", "misses")])
+
+registry.collectors.append(_cache_lines)
+
+_profile_lock = threading.Lock()   # cProfile allows one active profiler per process
+
+@app.before_request
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.sql_queries, g.sql_seconds = 0, 0.0
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE and _profile_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def _record_request_metrics(resp):
+    if "request_start" in g:
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or "unknown"
+        request_seconds.observe(elapsed, endpoint=endpoint)
+        request_queries.observe(g.sql_queries, endpoint=endpoint)
+        resp.headers['Server-Timing'] = (f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_queries} queries", '
+                                         f'app;dur={elapsed * 1000:.1f}')
+        if SQL_QUERY_BUDGET and g.sql_queries > SQL_QUERY_BUDGET:
+            app.logger.warning("%s %s ran %d SQL statements (budget %d)",
+                               request.method, request.path, g.sql_queries, SQL_QUERY_BUDGET)
+    return resp
+
+@app.teardown_request
+def _stop_profiler(exc):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            PROFILE_DIR, f"{request.endpoint or 'unknown'}-{int(time.time() * 1000)}-{os.getpid()}.prof"))
+    except Exception:
+        app.logger.exception("could not write profile")
+    finally:
+        _profile_lock.release()
+
+@app.get("/metrics")
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        abort(401)
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.get("/healthz")
 def healthz():
     return "ok", 200
 
+@app.get("/cache/stats")
+def cache_stats():
+    # per-process counters; each gunicorn worker reports its own
+    return jsonify(metadata=metadata_cache.stats.as_dict(), pid=os.getpid())
+
 @app.route('/', methods=['GET', 'POST'])
 @login_required
 def index():
@@ -84,83 +828,654 @@ def index():
                 return make_response("Missing URL", 400)
             return redirect(url_for('index'))
 
-        title, publisher, favicon = fetch_metadata(url)
-        article = Article(
-            user_id=current_user.id,
-            url=url,
-            title=title or url,
-            publisher=publisher or '—',
-            favicon_url=favicon,
-        )
-        db.session.add(article)
-        db.session.commit()
-
-        # HTMX: return only one <li> row (to prepend into #unread-list)
-        if is_htmx():
-            return render_template('partials/article_li.html', a=article)
+        # Already saved under this or an equivalent URL: answer from the index, no fetch
+        key = canonical_url(url)
+        existing = saved_article(current_user.id, key)
+        if existing:
+            return already_saved(existing)
 
-        return redirect(url_for('index'))
+        cached = cached_metadata(url)
+        if cached:
+            title, publisher, favicon = cached
+            article = Article(
+                user_id=current_user.id,
+                url=url,
+                title=title or url,
+                publisher=publisher or '—',
+                favicon_url=favicon,
+            )
+            db.session.add(article)
+            try:
+                db.session.flush()
+            except IntegrityError:
+                # lost a race with a concurrent save of the same page
+                db.session.rollback()
+                return already_saved(saved_article(current_user.id, key))
+        else:
+            # Save a placeholder right away; the enrichment worker fills in metadata
+            _, publisher, favicon = placeholder_metadata(url)
+            article = Article(
+                user_id=current_user.id,
+                url=url,
+                title=url,
+                publisher=publisher,
+                favicon_url=favicon,
+                metadata_status='pending',
+            )
+            db.session.add(article)
+            try:
+                db.session.flush()
+            except IntegrityError:
+                db.session.rollback()
+                return already_saved(saved_article(current_user.id, key))
+            enqueue_enrichment(article)
+        adjust_user_stats(current_user.id, unread=1, saved_this_week=1)
+        bump_library_version(current_user.id)
+        # HTMX: return only one <li> row (to prepend into #unread-list), rendered
+        # before the commit expires `article` so it is not loaded again
+        resp = render_template('partials/article_li.html', a=article) if is_htmx() else redirect(url_for('index'))
+        with span("db_commit"):
+            db.session.commit()
+        if not cached:
+            ensure_enrichment_workers()
+            _enrich_wakeup.set()
+        return resp
 
     view = request.args.get('view', 'all')
-    q = Article.query.filter_by(user_id=current_user.id)
-    if view == 'unread':
-        q = q.filter(Article.date_read.is_(None)).order_by(desc(Article.created_at))
-    elif view == 'read':
-        q = q.filter(Article.date_read.is_not(None)).order_by(desc(Article.date_read))
+    etag = library_etag('index', view)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    unread, cursor = article_page(current_user.id, 'unread')
+    return tagged(render_template('index.html', unread=unread, cursor=cursor,
+                                  read_count=read_count(current_user.id), view=view), etag)
+
+def saved_article(user_id, key):
+    return Article.query.filter_by(user_id=user_id, canonical_url=key).first()
+
+def already_saved(article):
+    # HTMX: refresh the existing row in place (if it is on screen) instead of prepending a copy
+    if is_htmx():
+        resp = make_response(render_template('partials/article_li.html', a=article, oob=True))
+        resp.headers['HX-Reswap'] = 'none'
+        return resp
+    flash('Already saved.', 'warn')
+    return redirect(url_for('index'))
+
+@app.post('/api/articles:batch')
+@login_required
+def save_batch():
+    """Save several URLs at once (browser extension, share sheet).
+
+    Body: {"urls": [...], "enrich": true} as JSON, or repeated `url` form fields.
+    New rows go in with one multi-row INSERT. Unless enrich is false their
+    metadata is then fetched concurrently, at most ENRICH_PER_HOST per host, so
+    the request takes about as long as the slowest fetch; whatever is still
+    unresolved stays queued for the enrichment workers. Answers with one
+    {"url", "status", "id", "title", "metadata_status"} per input URL, where
+    status is saved, exists (already in the library), duplicate (earlier in
+    this batch) or invalid.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        urls, enrich = data.get('urls'), bool(data.get('enrich', True))
     else:
-        q = q.order_by(
-            case((Article.date_read.is_(None), 0), else_=1),
-            desc(Article.date_read),
-            desc(Article.created_at),
-        )
-    items = q.all()
-    return render_template('index.html', items=items, view=view)
+        urls, enrich = request.form.getlist('url'), request.form.get('enrich', '1') != '0'
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) for u in urls):
+        return jsonify(error="expected a non-empty list of URLs"), 400
+    if len(urls) > BATCH_SAVE_MAX:
+        return jsonify(error=f"at most {BATCH_SAVE_MAX} URLs per batch"), 400
 
-@app.post('/toggle/<int:article_id>')
+    uid = current_user.id
+    for attempt in range(2):
+        try:
+            results, pending = insert_batch(uid, urls, inline=enrich)
+            break
+        except IntegrityError:
+            # a concurrent save took one of the URLs; look again
+            db.session.rollback()
+    else:
+        return jsonify(error="conflicting concurrent save, try again"), 409
+
+    if pending and enrich:
+        enrich_batch(pending)
+    articles = {a.id: a for a in Article.query.filter(Article.id.in_([r["id"] for r in results if "id" in r]))}
+    if any(a.metadata_status == 'pending' for a in articles.values()):
+        ensure_enrichment_workers()
+        _enrich_wakeup.set()
+
+    for r in results:
+        a = articles.get(r.get("id"))
+        if a is not None:
+            r.update(title=a.title, publisher=a.publisher, favicon_url=a.favicon_url,
+                     metadata_status=a.metadata_status)
+    return jsonify(results=results, saved=sum(r.get("status") == "saved" for r in results))
+
+def insert_batch(user_id, urls, inline=False):
+    """Insert the URLs not in the library yet, in one transaction. Returns the
+    per-URL results and the ids of the new rows still waiting for metadata
+    (cache hits go in done). With `inline`, those rows' jobs start out claimed (running, one attempt used) for enrich_batch; if the
+    request dies, the lease runs out and the workers pick them up."""
+    results = [{"url": u} for u in urls]
+    first = {}   # canonical key -> result of its first occurrence
+    for r in results:
+        url = r["url"].strip()
+        if not HOST_RE.match(host_of(url)):
+            r["status"] = "invalid"
+            continue
+        r["key"] = canonical_url(url)
+        if r["key"] in first:
+            r["status"] = "duplicate"
+        else:
+            first[r["key"]] = r
+
+    existing = dict(db.session.execute(
+        select(Article.canonical_url, Article.id)
+        .where(Article.user_id == user_id, Article.canonical_url.in_(list(first)))).all()) if first else {}
+    rows, new = [], []
+    for key, r in first.items():
+        if key in existing:
+            r.update(status="exists", id=existing[key])
+            continue
+        url = r["url"].strip()
+        cached = cached_metadata(url)
+        if cached:
+            title, publisher, favicon = cached
+            rows.append({"user_id": user_id, "url": url, "canonical_url": key, "title": title or url,
+                         "publisher": publisher or '—', "favicon_url": favicon, "metadata_status": "done"})
+        else:
+            _, publisher, favicon = placeholder_metadata(url)
+            rows.append({"user_id": user_id, "url": url, "canonical_url": key, "title": url,
+                         "publisher": publisher, "favicon_url": favicon, "metadata_status": "pending"})
+        new.append(r)
+
+    pending = []
+    if rows:
+        # executemany plus a lookup on the unique index: ordered RETURNING
+        # falls back to one INSERT per row on SQLite
+        db.session.execute(insert(Article), rows)
+        found = dict(db.session.execute(
+            select(Article.canonical_url, Article.id)
+            .where(Article.user_id == user_id, Article.canonical_url.in_([row["canonical_url"] for row in rows]))).all())
+        ids = [found[row["canonical_url"]] for row in rows]
+        now = datetime.utcnow()
+        claimed = {"status": "running", "locked_at": now, "attempts": 1} if inline else {}
+        jobs = [dict(article_id=i, **claimed) for i, row in zip(ids, rows) if row["metadata_status"] == "pending"]
+        if jobs:
+            db.session.execute(insert(EnrichmentJob), jobs)
+        for r, i, row in zip(new, ids, rows):
+            r.update(status="saved", id=i)
+            if row["metadata_status"] == "pending":
+                pending.append(i)
+        adjust_user_stats(user_id, unread=len(rows), saved_this_week=len(rows))
+        bump_library_version(user_id)
+    db.session.commit()
+
+    by_key = {key: r["id"] for key, r in first.items() if "id" in r}
+    for r in results:
+        if r.get("status") == "duplicate":
+            r["id"] = by_key.get(r["key"])
+        r.pop("key", None)
+    return results, pending
+
+def enrich_batch(article_ids):
+    """Fetch metadata for freshly inserted rows concurrently and store it in one commit."""
+    articles = Article.query.filter(Article.id.in_(article_ids)).all()
+
+    async def fetch_all():
+        try:
+            return await map_bounded_async(fetch_metadata_async, [a.url for a in articles],
+                                           concurrency=BATCH_SAVE_CONCURRENCY, per_host=ENRICH_PER_HOST)
+        finally:
+            await close_async_client()
+
+    with span("batch_enrich"):
+        fetched = asyncio.run(fetch_all())
+    jobs = {j.article_id: j for j in
+            EnrichmentJob.query.filter(EnrichmentJob.article_id.in_(article_ids))}
+    for a, (_, result, error) in zip(articles, fetched):
+        job = jobs.get(a.id)
+        if job is not None:
+            finish_enrichment_job(job, result, error, commit=False)
+    if articles:
+        bump_library_version(articles[0].user_id)
+    db.session.commit()
+
+@app.get('/list/<which>')
 @login_required
-def toggle(article_id):
+def article_list(which):
+    # Next page of a list (infinite scroll / opening the read block)
+    if which not in PAGED_LISTS:
+        abort(404)
+    etag = library_etag('list', which, request.args.get('after', ''))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    after = None
+    if request.args.get('after'):
+        try:
+            ts, _, last_id = request.args['after'].rpartition('_')
+            after = (datetime.fromisoformat(ts), int(last_id))
+        except ValueError:
+            abort(400)
+    items, cursor = article_page(current_user.id, which, after)
+    return tagged(render_template('partials/article_page.html', items=items, cursor=cursor, which=which), etag)
+
+def _icon_location(icon_url):
+    if icon_url and icon_url.lower().startswith(('https://', 'http://')):
+        return icon_url
+    return url_for('static', filename='icons/default.svg')
+
+@app.get('/icon/<host>')
+@login_required
+def icon(host):
+    host = host.lower()
+    if not HOST_RE.match(host):
+        return redirect(url_for('static', filename='icons/default.svg'))
+
+    row = db.session.get(HostIcon, host)
+    if row is None or datetime.utcnow() - row.checked_at > ICON_REVALIDATE:
+        fetch_host_icon(host)   # in the background; serve what we have meanwhile
+    if row is None:
+        # not stored yet: point at the best guess without letting the browser keep it
+        resp = redirect(_icon_location(cached_host_icon(host)))
+        resp.headers['Cache-Control'] = 'no-store'
+        return resp
+    # only raster bytes are served from our origin (rows stored before that
+    # rule are checked here too); SVGs and the rest are linked
+    ctype = raster_type(row.content)
+    if not ctype:
+        return redirect(_icon_location(row.icon_url))
+    resp = make_response(row.content)
+    resp.headers['Content-Type'] = ctype
+    resp.headers['X-Content-Type-Options'] = 'nosniff'
+    resp.headers['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    resp.headers['Cache-Control'] = f'private, max-age={ICON_MAX_AGE}'
+    resp.set_etag(hashlib.sha1(row.content).hexdigest())
+    return resp.make_conditional(request)
+
+_icon_fetches = ThreadPoolExecutor(max_workers=ICON_FETCH_WORKERS, thread_name_prefix="icon")
+_icon_inflight = set()
+_icon_lock = threading.Lock()
+
+def fetch_host_icon(host):
+    """Queue a (re)fetch of the stored icon for `host`, once per host at a time."""
+    with _icon_lock:
+        if host in _icon_inflight:
+            return
+        _icon_inflight.add(host)
+    _icon_fetches.submit(_fetch_host_icon, host)
+
+def _fetch_host_icon(host):
+    try:
+        with app.app_context():
+            row = db.session.get(HostIcon, host)
+            icon_url = resolve_host_icon(host)
+            if row is None or row.icon_url != icon_url:
+                row = row or HostIcon(host=host)
+                row.icon_url, row.content, row.etag = icon_url, None, None
+                db.session.add(row)
+            status, content, ctype, etag = download_icon(row.icon_url, etag=row.etag if row.content else None)
+            if status != 304:
+                row.content, row.content_type, row.etag = content, ctype, etag
+            row.checked_at = datetime.utcnow()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()   # another worker stored this host first
+    except Exception:
+        app.logger.exception("icon fetch for %s failed", host)
+    finally:
+        with _icon_lock:
+            _icon_inflight.discard(host)
+
+@app.get('/articles/<int:article_id>')
+@login_required
+def article_row(article_id):
+    # Polled by pending rows until enrichment finishes
+    etag = library_etag('row', article_id)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     a = Article.query.filter_by(id=article_id, user_id=current_user.id).first_or_404()
-    a.date_read = None if a.date_read else datetime.utcnow()
-    db.session.commit()
+    return tagged(render_row(a), etag)
+
+# Keyset pagination: list name -> (filter, sort column); ties are broken by id
+PAGED_LISTS = {
+    'unread': (Article.date_read.is_(None), Article.created_at),
+    'read': (Article.date_read.is_not(None), Article.date_read),
+}
 
+def article_page(user_id, which, after=None, limit=PAGE_SIZE):
+    """One page of a list, newest first, plus the cursor for the next page (or None)."""
+    cond, col = PAGED_LISTS[which]
+    q = Article.query.filter(Article.user_id == user_id, cond)
+    if after:
+        ts, last_id = after
+        q = q.filter(or_(col < ts, (col == ts) & (Article.id < last_id)))
+    rows = q.order_by(col.desc(), Article.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, f"{getattr(rows[-1], col.key).isoformat()}_{rows[-1].id}"
+
+def search_backend():
+    # FTS5 on SQLite, tsvector + GIN on Postgres (see utils/search_utils.py)
+    return backend_for(db.engine.dialect.name)
+
+@app.get('/search')
+@login_required
+def search():
+    q = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    hits = search_backend().search(db.session.connection(), current_user.id, q,
+                                   SEARCH_PAGE_SIZE + 1, (page - 1) * SEARCH_PAGE_SIZE)
+    ids = [article_id for article_id, _ in hits[:SEARCH_PAGE_SIZE]]
+    by_id = {a.id: a for a in Article.query.filter(Article.id.in_(ids), Article.user_id == current_user.id)}
+    results = [by_id[i] for i in ids if i in by_id]
+    ctx = dict(results=results, q=q, page=page, more=len(hits) > SEARCH_PAGE_SIZE)
     if is_htmx():
-        unread = (Article.query
-                  .filter_by(user_id=current_user.id)
-                  .filter(Article.date_read.is_(None))
-                  .order_by(Article.created_at.desc())
-                  .all())
-        read = (Article.query
-                .filter_by(user_id=current_user.id)
-                .filter(Article.date_read.is_not(None))
-                .order_by(Article.date_read.desc())
-                .all())
-        # Return OOB fragments that replace both lists (and read count)
-        return render_template('partials/lists_oob.html', unread=unread, read=read)
+        return render_template('partials/search_results.html', **ctx)
+    return render_template('search.html', **ctx)
+
+# ---- per-user counters ----
+
+def current_week_start(now=None):
+    today = (now or datetime.utcnow()).date()
+    return today - timedelta(days=today.weekday())
+
+def adjust_user_stats(user_id, unread=0, read=0, saved_this_week=0):
+    """Apply count deltas for a write to the user's articles, inside its transaction.
 
-    return redirect(url_for('index', view=request.args.get('view', 'all')))
+    A user without a stats row yet gets one computed from the articles table
+    (after flushing, so the write itself is counted).
+    """
+    week = current_week_start()
+    row = db.session.scalars(
+        update(UserStats).where(UserStats.user_id == user_id).values(
+            unread=UserStats.unread + unread,
+            read=UserStats.read + read,
+            total=UserStats.total + unread + read,
+            saved_this_week=case((UserStats.week_start == week, UserStats.saved_this_week + saved_this_week),
+                                 else_=max(saved_this_week, 0)),
+            week_start=week,
+        ).returning(UserStats).execution_options(synchronize_session=False)
+    ).one_or_none()
+    if row is None:
+        db.session.flush()
+        reconcile_user_stats(user_id)
+    elif has_request_context():
+        g.user_stats = row   # the new counts, for user_summary without another query
+
+def article_stats_delta(a, sign):
+    """(unread, read, saved_this_week) deltas for adding (+1) or removing (-1) article `a`."""
+    this_week = a.created_at is not None and a.created_at.date() >= current_week_start()
+    return {"unread": sign * (a.date_read is None), "read": sign * (a.date_read is not None),
+            "saved_this_week": sign * this_week}
+
+def reconcile_user_stats(user_id):
+    """Recompute one user's row from the articles table. Returns True if it had drifted."""
+    week = current_week_start()
+    row = (db.session.query(UserStats).filter_by(user_id=user_id)
+           .with_for_update().one_or_none())   # holds off concurrent deltas on Postgres
+    counts = db.session.query(
+        func.count(Article.id),
+        func.count(Article.date_read),
+        func.count(case((Article.created_at >= datetime.combine(week, datetime.min.time()), 1))),
+    ).filter(Article.user_id == user_id).one()
+    total, read, saved = counts
+    fresh = {"total": total, "unread": total - read, "read": read, "saved_this_week": saved, "week_start": week}
+    if row is None:
+        # a concurrent first request may be creating the row too
+        try:
+            with db.session.begin_nested():
+                db.session.add(UserStats(user_id=user_id, reconciled_at=datetime.utcnow(), **fresh))
+            return True
+        except IntegrityError:
+            row = (db.session.query(UserStats).filter_by(user_id=user_id)
+                   .with_for_update().populate_existing().one())
+    drifted = any(getattr(row, k) != v for k, v in fresh.items() if k != "week_start")
+    for k, v in fresh.items():
+        setattr(row, k, v)
+    row.reconciled_at = datetime.utcnow()
+    if drifted:
+        bump_library_version(user_id)   # cached pages (ETag / 304) show the old counts
+    return drifted
+
+def reconcile_all_user_stats():
+    """Reconcile every user, one transaction each. Returns (users, drifted)."""
+    user_ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+    drifted = 0
+    for uid in user_ids:
+        drifted += reconcile_user_stats(uid)
+        db.session.commit()
+    return len(user_ids), drifted
+
+def user_summary(user_id):
+    row = db.session.get(UserStats, user_id)
+    if row is None:
+        reconcile_user_stats(user_id)
+        db.session.commit()
+        row = db.session.get(UserStats, user_id)
+    this_week = row.week_start == current_week_start()
+    return {"total": row.total, "unread": row.unread, "read": row.read,
+            "saved_this_week": row.saved_this_week if this_week else 0,
+            "week_start": current_week_start().isoformat()}
+
+def read_count(user_id):
+    return user_summary(user_id)["read"]
+
+@app.get('/api/summary')
+@login_required
+def api_summary():
+    resp = jsonify(user_summary(current_user.id))
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+_reconcile_started_pid = None
+
+def ensure_stats_reconciler():
+    """Optional in-process periodic reconcile (STATS_RECONCILE_HOURS); cron `flask reconcile-stats` otherwise."""
+    global _reconcile_started_pid
+    if STATS_RECONCILE_HOURS <= 0 or _reconcile_started_pid == os.getpid():
+        return
+    with _enrich_lock:
+        if _reconcile_started_pid == os.getpid():
+            return
+        _reconcile_started_pid = os.getpid()
+        threading.Thread(target=_run_stats_reconciler, name="stats-reconcile", daemon=True).start()
+
+@app.before_request
+def _start_stats_reconciler():
+    ensure_stats_reconciler()
+
+def _run_stats_reconciler():
+    while True:
+        time.sleep(STATS_RECONCILE_HOURS * 3600 * random.uniform(0.9, 1.1))  # spread workers apart
+        with app.app_context():
+            try:
+                users, drifted = reconcile_all_user_stats()
+                if drifted:
+                    app.logger.warning("reconciled stats: %d of %d users had drifted", drifted, users)
+            except Exception:
+                app.logger.exception("stats reconcile failed")
+                db.session.rollback()
+
+@app.post('/toggle/<int:article_id>')
+@login_required
+def toggle(article_id):
+    # ownership check and flip in one statement
+    now = datetime.utcnow()
+    a = db.session.scalars(
+        update(Article).where(Article.id == article_id, Article.user_id == current_user.id)
+        .values(date_read=case((Article.date_read.is_(None), now), else_=None), updated_at=now)
+        .returning(Article), execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if a is None:
+        abort(404)
+    adjust_user_stats(current_user.id, unread=-1 if a.date_read else 1, read=1 if a.date_read else -1)
+    bump_library_version(current_user.id)
+
+    # responses are rendered before the commit expires `a` and the counters
+    if is_htmx():
+        # Move just this row: newly read rows go to the top of the read list,
+        # unread rows go back in front of the next older unread row.
+        if a.date_read:
+            swap = 'afterbegin:#read-list'
+        else:
+            neighbor = (db.session.query(Article.id)
+                        .filter(Article.user_id == current_user.id,
+                                Article.date_read.is_(None),
+                                or_(Article.created_at < a.created_at,
+                                    (Article.created_at == a.created_at) & (Article.id < a.id)))
+                        .order_by(Article.created_at.desc(), Article.id.desc())
+                        .first())
+            # #unread-end only exists once the whole list is loaded; otherwise
+            # the row arrives with a later page
+            swap = f'beforebegin:#article-{neighbor.id}' if neighbor else 'beforebegin:#unread-end'
+        resp = render_template('partials/article_moved.html', a=a, swap=swap,
+                               read_count=read_count(current_user.id))
+    else:
+        resp = redirect(url_for('index', view=request.args.get('view', 'all')))
+    db.session.commit()
+    return resp
 
 @app.post('/delete/<int:article_id>')
 @login_required
 def delete(article_id):
-    a = Article.query.filter_by(id=article_id, user_id=current_user.id).first_or_404()
-    db.session.delete(a)
-    db.session.commit()
+    # ownership check and delete in one statement
+    a = db.session.execute(
+        delete_rows(Article).where(Article.id == article_id, Article.user_id == current_user.id)
+        .returning(Article.created_at, Article.date_read), execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if a is None:
+        abort(404)
+    adjust_user_stats(current_user.id, **article_stats_delta(a, -1))
+    bump_library_version(current_user.id)
 
-    # HTMX: replace both lists (and count) to reflect deletion without reload
+    # HTMX: the form removes the row itself; only the count needs updating
     if is_htmx():
-        unread = (Article.query
-                  .filter_by(user_id=current_user.id)
-                  .filter(Article.date_read.is_(None))
-                  .order_by(Article.created_at.desc())
-                  .all())
-        read = (Article.query
-                .filter_by(user_id=current_user.id)
-                .filter(Article.date_read.is_not(None))
-                .order_by(Article.date_read.desc())
-                .all())
-        return render_template('partials/lists_oob.html', unread=unread, read=read)
+        resp = render_template('partials/read_count_oob.html', read_count=read_count(current_user.id))
+    else:
+        resp = redirect(url_for('index', view=request.args.get('view', 'all')))
+    db.session.commit()
+    return resp
+
+# ---- bulk import ----
+
+def import_links(user_id, links, progress=None):
+    """Insert links the user has not saved yet, in batches, each queued for enrichment.
+
+    `links` is an iterable of ImportedLink (see utils.import_utils.iter_links);
+    duplicates are matched on canonical_url. Returns (added, skipped).
+    """
+    seen = {key for (key,) in
+            db.session.query(Article.canonical_url).filter(Article.user_id == user_id).yield_per(1000)}
+    added = skipped = 0
+    batch = []
+
+    def flush():
+        ids = db.session.scalars(insert(Article).returning(Article.id), batch).all()
+        db.session.execute(insert(EnrichmentJob), [{"article_id": i} for i in ids])
+        read = sum(1 for row in batch if row["date_read"] is not None)
+        week = datetime.combine(current_week_start(), datetime.min.time())
+        adjust_user_stats(user_id, unread=len(batch) - read, read=read,
+                          saved_this_week=sum(1 for row in batch if row["created_at"] >= week))
+        bump_library_version(user_id)
+        db.session.commit()
+
+    now = datetime.utcnow()
+    for link in links:
+        key = canonical_url(link.url)
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+        _, publisher, favicon = placeholder_metadata(link.url)
+        batch.append({
+            "user_id": user_id,
+            "url": link.url,
+            "canonical_url": key,
+            "title": link.title or link.url,
+            "publisher": publisher,
+            "favicon_url": favicon,
+            "created_at": link.added_at or now,
+            "date_read": link.read_at,
+            "metadata_status": "pending",
+        })
+        if len(batch) >= IMPORT_BATCH:
+            flush()
+            added += len(batch)
+            batch = []
+            if progress:
+                progress(added, skipped)
+    if batch:
+        flush()
+        added += len(batch)
+    if progress:
+        progress(added, skipped)
+    return added, skipped
+
+def pending_enrichment_count(user_id=None):
+    q = (db.session.query(func.count(EnrichmentJob.id))
+         .filter(EnrichmentJob.status.in_(('pending', 'running'))))
+    if user_id is not None:
+        q = q.join(Article, Article.id == EnrichmentJob.article_id).filter(Article.user_id == user_id)
+    return q.scalar()
+
+@app.post('/import')
+@login_required
+def import_view():
+    f = request.files.get('file')
+    fmt = request.form.get('format') or None
+    if not f or not f.filename or (fmt and fmt not in IMPORT_FORMATS):
+        flash('Choose a bookmarks, Pocket/Instapaper export or URL list file', 'error')
+        return redirect(url_for('index'))
+
+    added, skipped = import_links(current_user.id, iter_links(f.stream, fmt, f.filename))
+    ensure_enrichment_workers()
+    _enrich_wakeup.set()
+    flash(f'Imported {added} links ({skipped} already saved). Titles fill in as they are fetched.', 'warn')
+    return redirect(url_for('index'))
+
+@app.get('/import/status')
+@login_required
+def import_status():
+    return jsonify(pending=pending_enrichment_count(current_user.id))
+
+@app.get('/export.<fmt>')
+@login_required
+def export(fmt):
+    """Stream the library as JSON Lines, CSV or Netscape bookmarks.
+
+    `since=<ISO timestamp>` limits the export to rows saved or changed (read,
+    unread, enriched) after it; the X-Export-Cursor header carries the value
+    to pass next time.
+    """
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    cursor = datetime.utcnow()
+    stmt = (select(Article.id, Article.url, Article.title, Article.publisher, Article.favicon_url,
+                   Article.created_at, Article.date_read)
+            .where(Article.user_id == current_user.id)
+            .order_by(Article.id)
+            .execution_options(yield_per=EXPORT_BATCH))
+    if request.args.get('since'):
+        try:
+            since = datetime.fromisoformat(request.args['since'].rstrip('Z'))
+        except ValueError:
+            abort(400)
+        stmt = stmt.where(Article.updated_at > since)
+
+    def rows():
+        # server-side cursor: rows are fetched EXPORT_BATCH at a time
+        yield from db.session.execute(stmt)
 
-    return redirect(url_for('index', view=request.args.get('view', 'all')))
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    resp = Response(stream_with_context(EXPORT_WRITERS[fmt](rows())), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename="someday-times.{ext}"'
+    resp.headers['X-Export-Cursor'] = cursor.isoformat() + 'Z'
+    return resp
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -192,6 +1507,9 @@ def register():
         user = User(email=email)
         user.set_password(password)
         db.session.add(user)
+        db.session.flush()
+        db.session.add(UserStats(user_id=user.id, week_start=current_week_start(),
+                                 reconciled_at=datetime.utcnow()))
         db.session.commit()
         login_user(user)
         return redirect(url_for('index'))
@@ -200,14 +1518,120 @@ def register():
 @app.get('/logout')
 @login_required
 def logout():
+    forget_principal(current_user.id)
     logout_user()
     return redirect(url_for('login'))
 
-@app.before_request
-def ensure_db():
-    if ENV == "development":
-        with app.app_context():
-            db.create_all()
+@app.cli.command('enrich-worker')
+@click.option('--threads', default=4, show_default=True, help='Worker threads in this process.')
+@click.option('--async', 'use_async', is_flag=True, help='Run one asyncio loop instead of threads.')
+@click.option('--concurrency', default=ENRICH_CONCURRENCY, show_default=True, help='Jobs in flight with --async.')
+def enrich_worker_command(threads, use_async, concurrency):
+    """Run metadata enrichment workers in the foreground."""
+    if use_async:
+        click.echo(f"enrichment loop running (up to {concurrency} jobs in flight)")
+        run_enrichment_loop(concurrency=concurrency)
+        return
+    workers = [threading.Thread(target=run_enrichment_worker, daemon=True) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    click.echo(f"enrichment workers running ({threads} threads)")
+    for t in workers:
+        t.join()
+
+@app.cli.command('import-links')
+@click.argument('email')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Input format (detected when omitted).')
+@click.option('--enrich/--no-enrich', default=True, show_default=True, help='Fetch metadata before exiting.')
+@click.option('--concurrency', default=8, show_default=True, help='Enrichment threads.')
+def import_links_command(email, path, fmt, enrich, concurrency):
+    """Import links for EMAIL from a bookmarks file, Pocket/Instapaper export or URL list."""
+    user = User.query.filter_by(email=email.lower().strip()).first()
+    if not user:
+        raise click.ClickException(f"no user {email}")
+    with click.open_file(path, 'rb') as f:
+        added, skipped = import_links(user.id, iter_links(f, fmt, path),
+                                      progress=lambda a, s: click.echo(f"  inserted {a}, skipped {s}"))
+    click.echo(f"imported {added} links, skipped {skipped} duplicates")
+    if not enrich or not added:
+        return
+
+    stop = threading.Event()
+    workers = [threading.Thread(target=run_enrichment_worker, args=(stop,), daemon=True)
+               for _ in range(concurrency)]
+    for t in workers:
+        t.start()
+    while True:
+        remaining = pending_enrichment_count(user.id)
+        db.session.remove()
+        click.echo(f"  enriching: {remaining} left")
+        if not remaining:
+            break
+        time.sleep(2)
+    stop.set()
+    for t in workers:
+        t.join()
+
+@app.cli.command('route-url')
+@click.argument('urls', nargs=-1, required=True)
+def route_url_command(urls):
+    """Show the provider and metadata strategy plan chosen for each URL."""
+    for url in urls:
+        plan = route(placeholder_metadata(url)[0])
+        click.echo(f"{url}\n  provider: {plan.provider.name}\n  plan: {' -> '.join(plan.strategies) or '(none)'}")
+        for label, value in (("oembed", plan.oembed_url), ("fetch", plan.fetch_url), ("doi", plan.doi)):
+            if value:
+                click.echo(f"  {label}: {value}")
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recompute user_stats from the articles table (run from cron, e.g. nightly)."""
+    users, drifted = reconcile_all_user_stats()
+    click.echo(f"reconciled {users} users, {drifted} had drifted")
+
+@app.cli.command('refresh-metadata')
+@click.option('--limit', default=REFRESH_BATCH, show_default=True, help='Rows to look at in this run.')
+def refresh_metadata_command(limit):
+    """Re-fetch fallback titles and guessed icons (run from cron, e.g. hourly)."""
+    checked, repaired = refresh_stale_metadata(
+        limit, progress=lambda c, r: click.echo(f"  checked {c}, repaired {r}"))
+    click.echo(f"checked {checked} rows, repaired {repaired}")
+
+@app.cli.command('purge-cache')
+def purge_cache_command():
+    """Delete expired metadata cache rows."""
+    if isinstance(metadata_cache.backend, SQLCache):
+        click.echo(f"purged {metadata_cache.backend.purge_expired()} rows")
+
+def schema_head_status():
+    """(ok, message) comparing the database's Alembic revision with the migration head."""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    with app.app_context():
+        config = migrate.get_config(os.path.join(BASE_DIR, 'migrations'))
+        heads = set(ScriptDirectory.from_config(config).get_heads())
+        with db.engine.connect() as conn:
+            current = set(MigrationContext.configure(conn).get_current_heads())
+    if current == heads:
+        return True, f"database at head {', '.join(sorted(heads))}"
+    return False, (f"database at {', '.join(sorted(current)) or 'no revision'}, "
+                   f"migrations head is {', '.join(sorted(heads))}; run `flask db upgrade`")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create any missing tables from the models (development only)."""
+    bootstrap_schema()
+    click.echo("tables created")
+
+@app.cli.command('check-schema')
+def check_schema_command():
+    """Exit non-zero unless the database is at the Alembic head."""
+    ok, message = schema_head_status()
+    click.echo(message)
+    if not ok:
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
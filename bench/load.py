@@ -0,0 +1,236 @@
+"""End-to-end load test for the save and list paths.
+
+Seeds a scratch SQLite database, starts the stub upstream (bench/stub_server.py)
+and gunicorn with the given workers/threads, then drives POST /, GET /,
+/toggle and /delete from concurrent logged-in clients and reports throughput
+and p50/p95/p99 per operation:
+
+    python -m bench.load --workers 2 --threads 4 --concurrency 16 --duration 30 --json after.json
+    python -m bench.load ... --baseline before.json      # print the change against an earlier run
+
+--url runs against an already started server instead; its users must be
+bench<N>@example.com with password "bench" (what --seed-only creates).
+"""
+import argparse, json, os, random, re, subprocess, sys, tempfile, threading, time, uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "bench"
+DEFAULT_MIX = "get=5,post=2,toggle=2,delete=1"
+ROW_ID = re.compile(r'id="article-(\d+)"')
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def percentile(sorted_samples, p):
+    if not sorted_samples:
+        return None
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * p / 100))]
+
+
+# ---- setup ----
+
+def server_env(db_url, upstream):
+    return dict(os.environ, FLASK_ENV="production", DATABASE_URL=db_url, FLASK_APP="app.py",
+                FETCH_UPSTREAM=upstream, SECRET_KEY="bench")
+
+
+def seed(env, users, articles):
+    """Migrate the scratch database and insert users x articles rows."""
+    subprocess.run([sys.executable, "-m", "flask", "db", "upgrade"], cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+    os.environ.update(env)   # app reads FLASK_ENV / DATABASE_URL at import
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import app, db, Article, User
+
+    pw = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    rnd = random.Random(42)
+    with app.app_context():
+        db.session.execute(insert(User), [{"email": f"bench{u}@example.com", "password_hash": pw}
+                                          for u in range(1, users + 1)])
+        for u in range(1, users + 1):
+            rows = []
+            for i in range(articles):
+                created = now - timedelta(minutes=rnd.randrange(525600))
+                rows.append({"user_id": u, "url": f"https://site{i % 50}.bench.example/posts/{u}-{i}",
+                             "title": f"Seeded article {i}", "publisher": f"site{i % 50}.bench.example",
+                             "created_at": created,
+                             "date_read": created + timedelta(hours=1) if rnd.random() < 0.5 else None})
+            db.session.execute(insert(Article), rows)
+        db.session.commit()
+
+
+def log_tail(path, lines=40):
+    try:
+        with open(path, errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def start_server(env, port, workers, threads, log_path):
+    # stderr goes to a file: an unread pipe fills up and stalls gunicorn mid-run
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+             "--workers", str(workers), "--threads", str(threads), "app:app"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    import requests
+    for _ in range(100):
+        if proc.poll() is not None:
+            raise SystemExit(f"gunicorn exited:\n{log_tail(log_path)}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/healthz", timeout=1).ok:
+                return proc
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit(f"gunicorn did not come up:\n{log_tail(log_path)}")
+
+
+# ---- load ----
+
+def client_loop(base, user, slot, slots, mix, deadline, samples, lock):
+    import requests
+    s = requests.Session()
+    s.post(f"{base}/login", data={"email": f"bench{user}@example.com", "password": PASSWORD})
+    # clients sharing a user split its rows so they never toggle/delete each other's
+    ids = [int(i) for i in ROW_ID.findall(s.get(base + "/").text)][slot::slots]
+    ops, weights = zip(*mix.items())
+    rnd = random.Random()
+    local = []
+    while time.monotonic() < deadline:
+        op = rnd.choices(ops, weights)[0]
+        if op in ("toggle", "delete") and not ids:
+            op = "post"
+        t = time.perf_counter()
+        try:
+            if op == "get":
+                r = s.get(base + "/")
+            elif op == "post":
+                host = f"site{rnd.randrange(50)}.bench.example"
+                r = s.post(base + "/", data={"url": f"https://{host}/posts/load-{uuid.uuid4().hex[:12]}"},
+                           headers={"HX-Request": "true"})
+                m = ROW_ID.search(r.text)
+                if m:
+                    ids.append(int(m.group(1)))
+            elif op == "toggle":
+                r = s.post(f"{base}/toggle/{rnd.choice(ids)}", headers={"HX-Request": "true"})
+            else:
+                r = s.post(f"{base}/delete/{ids.pop(rnd.randrange(len(ids)))}", headers={"HX-Request": "true"})
+            ok = r.status_code < 400
+        except Exception:
+            ok = False
+        local.append((op, (time.perf_counter() - t) * 1000, ok))
+    with lock:
+        samples.extend(local)
+
+
+def run_load(base, users, concurrency, duration, mix):
+    samples, lock = [], threading.Lock()
+    deadline = time.monotonic() + duration
+    slots = -(-concurrency // users)
+    threads = [threading.Thread(target=client_loop,
+                                args=(base, 1 + i % users, i // users, slots, mix, deadline, samples, lock))
+               for i in range(concurrency)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(samples, time.monotonic() - start)
+
+
+def summarize(samples, elapsed):
+    out = {}
+    for op in sorted({s[0] for s in samples}) + ["all"]:
+        rows = [s for s in samples if op == "all" or s[0] == op]
+        lat = sorted(ms for _, ms, _ in rows)
+        out[op] = {"requests": len(rows), "errors": sum(1 for r in rows if not r[2]),
+                   "rps": len(rows) / elapsed,
+                   "p50_ms": percentile(lat, 50), "p95_ms": percentile(lat, 95), "p99_ms": percentile(lat, 99)}
+    return out
+
+
+def report(results, baseline=None):
+    base = (baseline or {}).get("results", {})
+    for op, r in results.items():
+        line = (f"{op:8} {r['requests']:7d} req  {r['errors']:4d} err  {r['rps']:8.1f} req/s  "
+                f"p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  p99 {r['p99_ms']:7.1f} ms")
+        if op in base:
+            b = base[op]
+            line += "   vs baseline: " + "  ".join(
+                f"{k.split('_')[0]} {100 * (r[k] - b[k]) / b[k]:+.0f}%" for k in ("rps", "p50_ms", "p99_ms") if b[k])
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--articles", type=int, default=500, help="seeded articles per user")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--upstream-latency", type=float, default=50, help="stub upstream delay in ms")
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--db", help="SQLite file to seed (default: a temp file)")
+    parser.add_argument("--seed-only", action="store_true", help="seed --db and exit")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    args = parser.parse_args()
+    mix = {k: float(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+
+    proc = log_path = None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        from bench.stub_server import serve
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="someday-bench-"), "bench.db")
+        env = server_env(f"sqlite:///{db_path}", f"http://127.0.0.1:{args.stub_port}")
+        seed(env, args.users, args.articles)
+        if args.seed_only:
+            print(f"seeded {db_path}")
+            return
+        serve(args.stub_port, args.upstream_latency, args.upstream_latency / 3, background=True)
+        log_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), "gunicorn.log")
+        proc = start_server(env, args.port, args.workers, args.threads, log_path)
+        base = f"http://127.0.0.1:{args.port}"
+
+    try:
+        results = run_load(base, args.users, args.concurrency, args.duration, mix)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if log_path and results["all"]["errors"]:
+        print(f"\n{results['all']['errors']} failed requests; end of {log_path}:\n{log_tail(log_path)}")
+    if args.json:
+        config = {k: getattr(args, k) for k in ("workers", "threads", "users", "articles", "concurrency",
+                                                 "duration", "mix", "upstream_latency", "url")}
+        with open(args.json, "w") as f:
+            json.dump({"revision": git_revision(), "time": time.time(), "config": config,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Micro-benchmarks for the pure helpers on the metadata path.
+
+    python -m bench.micro
+    python -m bench.micro --json micro.json --only extract_title
+"""
+import argparse, json, os, sys, time, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.load import git_revision
+from bench.stub_server import make_page, make_pdf
+from utils.html_utils import read_head
+from utils.icon_utils import pick_largest_icon
+from utils.metadata_utils import extract_title, slug_to_title
+from utils.pdf_utils import try_pdf_title
+
+
+class _Response:
+    """Just enough of requests.Response for read_head."""
+
+    url = "https://blog.example.org/posts/some-article"
+    headers = {"Content-Type": "text/html; charset=utf-8"}
+
+    def __init__(self, body):
+        self.body = body
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+    def close(self):
+        pass
+
+
+def parse_head(html):
+    return read_head(_Response(html.encode()))
+
+
+def cases():
+    page = make_page("blog.example.org", "/posts/why-we-rewrote-the-parser", 30 * 1024).decode()
+    head = parse_head(page)
+    no_og = parse_head(page.replace("og:title", "description"))
+    icons = [("/favicon-16.png", "16x16"), ("/favicon-32.png", "32x32"), ("/icon.png", None),
+             ("/apple-touch-icon.png", "180x180 152x152"), ("/bad.png", "axb")]
+    small_pdf = make_pdf("A small PDF", 0)
+    big_pdf = make_pdf("A padded PDF", 2 * 1024 * 1024)
+    return {
+        "slug_to_title": lambda: slug_to_title("/news/2024/05/the-state-of-the-art-in-x-123456.html", "wsj.com"),
+        "extract_title": lambda: extract_title(head),
+        "extract_title_no_og": lambda: extract_title(no_og),
+        "read_head_30kb": lambda: parse_head(page),
+        "pick_largest_icon": lambda: pick_largest_icon(icons, "https://blog.example.org"),
+        "try_pdf_title": lambda: try_pdf_title(small_pdf),
+        "try_pdf_title_2mb": lambda: try_pdf_title(big_pdf),
+    }
+
+
+def bench(fn, min_time):
+    # calibrate like timeit's autorange, then take the best of 5 runs
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return {"us_per_call": best * 1e6, "calls_per_sec": 1 / best, "number": number}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", action="append", help="run just these cases")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in cases().items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = r = bench(fn, args.min_time)
+        print(f"{name:24} {r['us_per_call']:12.2f} us   {r['calls_per_sec']:12.0f} /s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"revision": git_revision(), "time": time.time(), "micro": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
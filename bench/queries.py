@@ -0,0 +1,97 @@
+"""SQL statements per request on the hot routes, with and without the principal cache.
+
+Seeds a scratch SQLite database (as bench/load.py does), then drives the app
+in-process with Flask's test client and reads the statement count every
+response reports in its Server-Timing header:
+
+    python -m bench.queries --json after.json
+    python -m bench.queries --baseline before.json
+
+"uncached" sets PRINCIPAL_TTL to 0, so load_user queries the users table on
+every request as it used to.
+"""
+import argparse, json, os, re, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.load import PASSWORD, ROW_ID, git_revision, seed, server_env
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+HTMX = {"HX-Request": "true"}
+
+
+def routes(client, counter):
+    """(name, callable) pairs; each call makes one request and returns the response."""
+    ids = [int(i) for i in ROW_ID.findall(client.get("/").get_data(as_text=True))]
+    etag = client.get("/").headers["ETag"]
+
+    def post():
+        counter[0] += 1
+        return client.post("/", data={"url": f"https://bench.example/q-{counter[0]}-{time.time_ns()}"}, headers=HTMX)
+
+    return [
+        ("GET /", lambda: client.get("/")),
+        ("GET / (304)", lambda: client.get("/", headers={"If-None-Match": etag})),
+        ("GET /api/summary", lambda: client.get("/api/summary")),
+        ("GET /search", lambda: client.get("/search?q=seeded", headers=HTMX)),
+        ("POST /", post),
+        ("POST /toggle", lambda: client.post(f"/toggle/{ids[0]}", headers=HTMX)),
+        ("POST /delete", lambda: client.post(f"/delete/{ids.pop()}", headers=HTMX)),
+    ]
+
+
+def measure(app_module, ttl, repeat):
+    app_module.PRINCIPAL_TTL = ttl
+    app_module.principal_cache._data.clear()
+    client = app_module.app.test_client()
+    client.post("/login", data={"email": "bench1@example.com", "password": PASSWORD})
+    out = {}
+    for name, call in routes(client, [0]):
+        counts, times = [], []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            resp = call()
+            times.append((time.perf_counter() - t) * 1000)
+            m = QUERIES.search(resp.headers.get("Server-Timing", ""))
+            counts.append(int(m.group(1)) if m else None)
+        out[name] = {"queries": max(counts), "mean_ms": sum(times) / len(times)}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=500, help="seeded articles for the test user")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per route")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="someday-bench-"), "bench.db")
+    env = server_env(f"sqlite:///{db_path}", "http://127.0.0.1:9")
+    env["ENRICH_WORKERS"] = "0"
+    seed(env, 2, args.articles)
+    import app as app_module
+
+    results = {"uncached": measure(app_module, 0, args.repeat),
+               "cached": measure(app_module, 60, args.repeat)}
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]["cached"]
+
+    print(f"{'SQL statements':18} {'uncached':>9} {'cached':>7}   {'cached ms':>9}"
+          + ("   baseline" if baseline else ""))
+    for name, r in results["cached"].items():
+        line = f"{name:18} {results['uncached'][name]['queries']:9d} {r['queries']:7d}"
+        line += f"   {r['mean_ms']:9.2f}"
+        if name in baseline:
+            line += f"   {baseline[name]['queries']:8d}"
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"revision": git_revision(), "time": time.time(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
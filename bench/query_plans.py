@@ -0,0 +1,123 @@
+"""Query plans and timings for the article list queries, with and without indexes.
+
+Seeds N users x M articles into a scratch database, then runs the old
+full-library queries (including the view=all case() ordering) and the keyset
+page queries twice: once with the article list indexes dropped, once with
+them in place.
+
+    python -m bench.query_plans --users 20 --articles 5000
+    python -m bench.query_plans --db postgresql://localhost/someday_bench
+"""
+import argparse, os, random, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import case, create_engine, desc, func, insert, select, text
+
+from app import db, Article, User
+
+LIST_INDEXES = ("ix_articles_user_unread", "ix_articles_user_read")
+
+
+def seed(engine, users, articles):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": u, "email": f"user{u}@example.com", "password_hash": "x"}
+                                    for u in range(1, users + 1)])
+        for u in range(1, users + 1):
+            rows = []
+            for i in range(articles):
+                created = now - timedelta(minutes=rnd.randrange(525600))
+                read = created + timedelta(minutes=rnd.randrange(10000)) if rnd.random() < 0.6 else None
+                rows.append({"user_id": u, "url": f"https://example.com/{u}/{i}", "title": f"Article {i}",
+                             "publisher": "example.com", "created_at": created, "date_read": read})
+            conn.execute(insert(Article), rows)
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE articles"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def queries(user_id, cursor_ts):
+    a = Article.__table__.c
+    return {
+        "old: view=all case() order": select(Article.__table__).where(a.user_id == user_id).order_by(
+            case((a.date_read.is_(None), 0), else_=1), desc(a.date_read), desc(a.created_at)),
+        "old: unread, full list": select(Article.__table__).where(
+            a.user_id == user_id, a.date_read.is_(None)).order_by(a.created_at.desc()),
+        "old: read, full list": select(Article.__table__).where(
+            a.user_id == user_id, a.date_read.is_not(None)).order_by(a.date_read.desc()),
+        "new: unread first page": select(Article.__table__).where(
+            a.user_id == user_id, a.date_read.is_(None)).order_by(a.created_at.desc(), a.id.desc()).limit(51),
+        "new: unread page after cursor": select(Article.__table__).where(
+            a.user_id == user_id, a.date_read.is_(None),
+            (a.created_at < cursor_ts) | ((a.created_at == cursor_ts) & (a.id < 10 ** 9))
+        ).order_by(a.created_at.desc(), a.id.desc()).limit(51),
+        "new: read first page": select(Article.__table__).where(
+            a.user_id == user_id, a.date_read.is_not(None)).order_by(a.date_read.desc(), a.id.desc()).limit(51),
+        "new: read count": select(func.count(a.id)).where(a.user_id == user_id, a.date_read.is_not(None)),
+    }
+
+
+def explain(conn, stmt):
+    compiled = str(stmt.compile(conn, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text("EXPLAIN " + compiled)).fetchall()
+        return [r[0] for r in rows]
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + compiled)).fetchall()
+    return [r[-1] for r in rows]
+
+
+def timed(conn, stmt, runs):
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        conn.execute(stmt).fetchall()
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+
+def run_phase(engine, label, user_id, runs):
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        cursor_ts = conn.execute(select(func.min(Article.created_at))).scalar() + timedelta(days=180)
+        for name, stmt in queries(user_id, cursor_ts).items():
+            ms = timed(conn, stmt, runs)
+            print(f"{name:32s} {ms:9.2f} ms")
+            for line in explain(conn, stmt):
+                print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="database URL (default: a temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--articles", type=int, default=2000, help="articles per user")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    url = args.db or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(url)
+    print(f"seeding {args.users} users x {args.articles} articles into {engine.url.render_as_string()}")
+    seed(engine, args.users, args.articles)
+
+    with engine.begin() as conn:
+        for name in LIST_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+    run_phase(engine, "before: no list indexes", args.users // 2 or 1, args.runs)
+
+    for index in Article.__table__.indexes:
+        if index.name in LIST_INDEXES:
+            index.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    run_phase(engine, "after: partial list indexes", args.users // 2 or 1, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Per-request latency with and without the old before_request db.create_all() hook.
+
+    python -m bench.request_overhead --requests 2000
+"""
+import argparse, os, statistics, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+
+
+def old_ensure_db():
+    # what used to run on every request in development
+    with app.app_context():
+        db.create_all()
+
+
+def measure(client, path, n):
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        client.get(path)
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--path", action="append", help="paths to hit (default: /healthz and a static file)")
+    args = parser.parse_args()
+    paths = args.path or ["/healthz", "/static/icons/default.svg"]
+
+    client = app.test_client()
+    for path in paths:
+        client.get(path)  # warm up
+        after = measure(client, path, args.requests)
+        app.before_request_funcs.setdefault(None, []).append(old_ensure_db)
+        before = measure(client, path, args.requests)
+        app.before_request_funcs[None].remove(old_ensure_db)
+        print(f"{path}")
+        print(f"  with create_all hook   p50 {before[0]:7.3f} ms   p95 {before[1]:7.3f} ms")
+        print(f"  without (current)      p50 {after[0]:7.3f} ms   p95 {after[1]:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
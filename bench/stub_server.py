@@ -0,0 +1,146 @@
+"""Local stand-in for the sites fetch_metadata talks to.
+
+Serves requests in the FETCH_UPSTREAM layout (/<host>/<path>?<query>, see
+utils/http_utils.py) with canned oEmbed JSON, Crossref works, HTML pages,
+web manifests, icons and PDFs, after a configurable delay:
+
+    python -m bench.stub_server --port 8765 --latency 80 --jitter 40 --page-kb 60
+    FETCH_UPSTREAM=http://127.0.0.1:8765 flask run
+
+Paths ending in .pdf get a real PDF (Range requests supported) padded to
+--pdf-kb; /oembed and /api/oembed.json answer as oEmbed providers;
+api.crossref.org answers /works/<doi>; anything else is an HTML page whose
+<head> links several icon sizes and a manifest.
+"""
+import argparse, io, json, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_pdf(title, size):
+    from pypdf import PdfWriter
+    w = PdfWriter()
+    w.add_blank_page(612, 792)
+    w.add_metadata({"/Title": title})
+    if size > 0:
+        w.add_attachment("padding.bin", b"\0" * size)  # keeps the xref valid, unlike trailing junk
+    out = io.BytesIO()
+    w.write(out)
+    return out.getvalue()
+
+
+def make_page(host, path, size):
+    title = path.strip("/").split("/")[-1].replace("-", " ").title() or host
+    head = (f"<!doctype html><html><head><meta charset='utf-8'><title>{title} | {host}</title>"
+            f"<meta property='og:title' content='{title}'>"
+            "<link rel='icon' href='/favicon-32.png' sizes='32x32'>"
+            "<link rel='icon' href='/favicon-16.png' sizes='16x16'>"
+            "<link rel='apple-touch-icon' href='/apple-touch-icon.png' sizes='180x180'>"
+            "<link rel='manifest' href='/site.webmanifest'></head><body>")
+    filler = "<p>" + "lorem ipsum dolor sit amet " * 20 + "</p>\n"
+    body = filler * max(0, (size - len(head)) // len(filler))
+    return (head + body + "</body></html>").encode()
+
+
+MANIFEST = json.dumps({"icons": [{"src": "/icon-192.png", "sizes": "192x192"},
+                                 {"src": "/icon-512.png", "sizes": "512x512"}]}).encode()
+ICON = bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                     "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = {"latency": 0.0, "jitter": 0.0, "page_size": 30 * 1024, "pdf_size": 200 * 1024}
+    _pdfs = {}
+    _pdf_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        c = self.config
+        time.sleep(max(0.0, c["latency"] + random.uniform(-c["jitter"], c["jitter"])))
+        parsed = urlparse(self.path)
+        host, _, path = parsed.path.lstrip("/").partition("/")
+        path = "/" + path
+        query = parse_qs(parsed.query)
+
+        if path.endswith(".pdf"):
+            return self._send_pdf(path)
+        if "oembed" in path:
+            url = query.get("url", [""])[0]
+            return self._send(json.dumps({
+                "title": f"Stub video {url.rsplit('/', 1)[-1]}", "author_name": "Stub Author",
+                "html": "<blockquote><p>Stub post text https://t.co/x</p></blockquote>",
+                "thumbnail_url": f"https://{host}/thumb.jpg",
+            }).encode(), "application/json")
+        if host == "api.crossref.org" and path.startswith("/works/"):
+            return self._send(json.dumps({"message": {"title": [f"Stub paper {path[7:]}"]}}).encode(),
+                              "application/json")
+        if path.endswith(".webmanifest") or path.endswith("manifest.json"):
+            return self._send(MANIFEST, "application/manifest+json")
+        if re.search(r"\.(png|ico|jpg|svg)$", path):
+            return self._send(ICON, "image/png")
+        return self._send(make_page(host, path, c["page_size"]), "text/html; charset=utf-8")
+
+    def _send_pdf(self, path):
+        with self._pdf_lock:
+            if path not in self._pdfs:
+                self._pdfs[path] = make_pdf(f"Stub PDF {path.rsplit('/', 1)[-1]}", self.config["pdf_size"])
+        data = self._pdfs[path]
+        m = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if not m:
+            return self._send(data, "application/pdf")
+        start, end = m.groups()
+        if start == "":
+            start, end = max(0, len(data) - int(end)), len(data) - 1
+        else:
+            start, end = int(start), min(len(data) - 1, int(end) if end else len(data) - 1)
+        self._send(data[start:end + 1], "application/pdf", 206,
+                   {"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+
+    def _send(self, body, ctype, status=200, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients hang up as soon as they have read the <head>; that is expected
+
+
+def serve(port=8765, latency_ms=0, jitter_ms=0, page_kb=30, pdf_kb=200, background=False):
+    StubHandler.config = {"latency": latency_ms / 1000, "jitter": jitter_ms / 1000,
+                          "page_size": page_kb * 1024, "pdf_size": pdf_kb * 1024}
+    server = StubServer(("127.0.0.1", port), StubHandler)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=50, help="mean response delay in ms")
+    parser.add_argument("--jitter", type=float, default=20, help="uniform +/- ms around --latency")
+    parser.add_argument("--page-kb", type=int, default=30, help="HTML page size")
+    parser.add_argument("--pdf-kb", type=int, default=200, help="PDF size")
+    args = parser.parse_args()
+    print(f"stub upstream on http://127.0.0.1:{args.port}")
+    serve(args.port, args.latency, args.jitter, args.page_kb, args.pdf_kb)
+
+
+if __name__ == "__main__":
+    main()
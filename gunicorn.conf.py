@@ -4,4 +4,16 @@ threads = 4
 timeout = 60
 graceful_timeout = 30
 keepalive = 5
-preload_app = True
\ No newline at end of file
+preload_app = True
+
+
+def when_ready(server):
+    # Startup self-check: the app (preloaded) must match the migrated schema
+    from app import ENV, schema_head_status
+    if ENV != "production":
+        return
+    ok, message = schema_head_status()
+    if not ok:
+        server.log.error("schema check failed: %s", message)
+        raise SystemExit(1)
+    server.log.info("schema check: %s", message)
@@ -0,0 +1,45 @@
+"""enrichment queue
+
+Revision ID: 3b9c1f6a2d47
+Revises: e74408a0dc4e
+Create Date: 2026-10-17 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9c1f6a2d47'
+down_revision = 'e74408a0dc4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('metadata_status', sa.String(length=16), server_default='done', nullable=False))
+
+    op.create_table('enrichment_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('enrichment_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_enrichment_jobs_run_after'), ['run_after'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('enrichment_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_enrichment_jobs_run_after'))
+
+    op.drop_table('enrichment_jobs')
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('metadata_status')
@@ -0,0 +1,35 @@
+"""article refresh backoff
+
+Revision ID: 4e8b2c6a1d95
+Revises: 9c5a1e7d3f20
+Create Date: 2026-10-18 00:41:19.582044
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.search_utils import backend_for
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b2c6a1d95'
+down_revision = '9c5a1e7d3f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMNs, so SQLite keeps the table (and its search triggers)
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('refresh_attempts', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('refresh_after', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('refresh_after')
+        batch_op.drop_column('refresh_attempts')
+
+    if bind.dialect.name == 'sqlite':
+        backend_for(bind.dialect.name).install(bind)
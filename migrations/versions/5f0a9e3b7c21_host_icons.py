@@ -0,0 +1,32 @@
+"""host icons
+
+Revision ID: 5f0a9e3b7c21
+Revises: 8d2e4a7c9f10
+Create Date: 2026-10-17 14:03:52.907731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f0a9e3b7c21'
+down_revision = '8d2e4a7c9f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('host_icons',
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('icon_url', sa.Text(), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=True),
+    sa.Column('content_type', sa.String(length=64), nullable=True),
+    sa.Column('etag', sa.String(length=255), nullable=True),
+    sa.Column('checked_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('host')
+    )
+
+
+def downgrade():
+    op.drop_table('host_icons')
@@ -0,0 +1,46 @@
+"""user stats
+
+Revision ID: 7b3e5d2f8a64
+Revises: e2b7a93c5d18
+Create Date: 2026-10-17 23:12:07.664019
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e5d2f8a64'
+down_revision = 'e2b7a93c5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('unread', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('read', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('saved_this_week', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=True),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from the articles table in one pass
+    today = datetime.utcnow().date()
+    week = today - timedelta(days=today.weekday())
+    op.get_bind().execute(sa.text(
+        "INSERT INTO user_stats (user_id, total, unread, read, saved_this_week, week_start, reconciled_at) "
+        "SELECT u.id, count(a.id), count(a.id) - count(a.date_read), count(a.date_read), "
+        "       count(CASE WHEN a.created_at >= :week_dt THEN 1 END), :week, :now "
+        "FROM users u LEFT JOIN articles a ON a.user_id = u.id GROUP BY u.id"
+    ), {"week_dt": datetime.combine(week, datetime.min.time()), "week": week, "now": datetime.utcnow()})
+
+
+def downgrade():
+    op.drop_table('user_stats')
@@ -0,0 +1,34 @@
+"""metadata cache
+
+Revision ID: 8d2e4a7c9f10
+Revises: 3b9c1f6a2d47
+Create Date: 2026-10-17 11:40:05.562310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4a7c9f10'
+down_revision = '3b9c1f6a2d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('metadata_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('metadata_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_metadata_cache_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('metadata_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_metadata_cache_expires_at'))
+
+    op.drop_table('metadata_cache')
@@ -0,0 +1,112 @@
+"""article canonical url
+
+Revision ID: 9c5a1e7d3f20
+Revises: 7b3e5d2f8a64
+Create Date: 2026-10-17 23:58:41.207315
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.cache_utils import canonical_url
+from utils.search_utils import backend_for
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5a1e7d3f20'
+down_revision = '7b3e5d2f8a64'
+branch_labels = None
+depends_on = None
+
+BATCH = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('canonical_url', sa.Text(), nullable=True))
+
+    # Canonicalize existing rows in id order, BATCH at a time
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, url FROM articles WHERE id > :last ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH}).all()
+        if not rows:
+            break
+        bind.execute(sa.text("UPDATE articles SET canonical_url = :key WHERE id = :id"),
+                     [{"id": r.id, "key": canonical_url(r.url)} for r in rows])
+        last_id = rows[-1].id
+
+    # Merge duplicates into the oldest row, keeping the earliest read date and
+    # the first fetched title if the oldest is still a placeholder
+    groups = bind.execute(sa.text(
+        "SELECT user_id, canonical_url FROM articles GROUP BY user_id, canonical_url HAVING count(*) > 1"
+    )).all()
+    users = set()
+    for g in groups:
+        rows = bind.execute(sa.text(
+            "SELECT id, url, title, publisher, favicon_url, date_read, metadata_status FROM articles "
+            "WHERE user_id = :user_id AND canonical_url = :key ORDER BY id"
+        ), {"user_id": g.user_id, "key": g.canonical_url}).all()
+        keep, dups = rows[0], rows[1:]
+        values = {"id": keep.id, "date_read": keep.date_read, "title": keep.title,
+                  "publisher": keep.publisher, "favicon_url": keep.favicon_url,
+                  "metadata_status": keep.metadata_status}
+        read = [r.date_read for r in rows if r.date_read is not None]
+        if read:
+            values["date_read"] = min(read)
+        if keep.title in (None, keep.url):
+            for r in dups:
+                if r.metadata_status == 'done' and r.title not in (None, r.url):
+                    values.update(title=r.title, publisher=r.publisher, favicon_url=r.favicon_url,
+                                  metadata_status='done')
+                    break
+        bind.execute(sa.text(
+            "UPDATE articles SET date_read = :date_read, title = :title, publisher = :publisher, "
+            "favicon_url = :favicon_url, metadata_status = :metadata_status WHERE id = :id"
+        ), values)
+        ids = [r.id for r in dups]
+        bind.execute(sa.text("DELETE FROM enrichment_jobs WHERE article_id IN :ids")
+                     .bindparams(sa.bindparam("ids", expanding=True)), {"ids": ids})
+        bind.execute(sa.text("DELETE FROM articles WHERE id IN :ids")
+                     .bindparams(sa.bindparam("ids", expanding=True)), {"ids": ids})
+        users.add(g.user_id)
+
+    if users:
+        # Counters and cached pages of the merged libraries are stale now
+        today = datetime.utcnow().date()
+        week = today - timedelta(days=today.weekday())
+        params = {"users": sorted(users), "week_dt": datetime.combine(week, datetime.min.time()),
+                  "week": week, "now": datetime.utcnow()}
+        expanding = sa.bindparam("users", expanding=True)
+        bind.execute(sa.text("DELETE FROM user_stats WHERE user_id IN :users").bindparams(expanding), params)
+        bind.execute(sa.text(
+            "INSERT INTO user_stats (user_id, total, unread, read, saved_this_week, week_start, reconciled_at) "
+            "SELECT u.id, count(a.id), count(a.id) - count(a.date_read), count(a.date_read), "
+            "       count(CASE WHEN a.created_at >= :week_dt THEN 1 END), :week, :now "
+            "FROM users u LEFT JOIN articles a ON a.user_id = u.id WHERE u.id IN :users GROUP BY u.id"
+        ).bindparams(expanding), params)
+        bind.execute(sa.text(
+            "UPDATE users SET library_version = library_version + 1 WHERE id IN :users"
+        ).bindparams(expanding), params)
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.alter_column('canonical_url', existing_type=sa.Text(), nullable=False)
+        batch_op.create_index('ix_articles_user_canonical', ['user_id', 'canonical_url'], unique=True)
+
+    # The SQLite batch rebuild of `articles` dropped the search triggers
+    if bind.dialect.name == 'sqlite':
+        backend_for(bind.dialect.name).install(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index('ix_articles_user_canonical')
+        batch_op.drop_column('canonical_url')
+
+    if bind.dialect.name == 'sqlite':
+        backend_for(bind.dialect.name).install(bind)
@@ -0,0 +1,41 @@
+"""article list indexes
+
+Revision ID: a61c0d8e5b39
+Revises: 5f0a9e3b7c21
+Create Date: 2026-10-17 19:22:16.340958
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61c0d8e5b39'
+down_revision = '5f0a9e3b7c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Partial indexes matching the unread (created_at, id) and read (date_read, id)
+    # keyset orderings, both scoped to a user.
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.create_index('ix_articles_user_unread', ['user_id', 'created_at', 'id'], unique=False,
+                              postgresql_where=sa.text('date_read IS NULL'),
+                              sqlite_where=sa.text('date_read IS NULL'))
+        batch_op.create_index('ix_articles_user_read', ['user_id', 'date_read', 'id'], unique=False,
+                              postgresql_where=sa.text('date_read IS NOT NULL'),
+                              sqlite_where=sa.text('date_read IS NOT NULL'))
+
+    # ON DELETE CASCADE from articles needs this to avoid a scan per delete
+    with op.batch_alter_table('enrichment_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_enrichment_jobs_article_id'), ['article_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('enrichment_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_enrichment_jobs_article_id'))
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index('ix_articles_user_read')
+        batch_op.drop_index('ix_articles_user_unread')
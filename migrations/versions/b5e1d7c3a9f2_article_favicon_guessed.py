@@ -0,0 +1,40 @@
+"""article favicon guessed
+
+Revision ID: b5e1d7c3a9f2
+Revises: 4e8b2c6a1d95
+Create Date: 2026-10-18 09:12:47.361820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.search_utils import backend_for
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1d7c3a9f2'
+down_revision = '4e8b2c6a1d95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN, so SQLite keeps the table (and its search triggers)
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('favicon_guessed', sa.Boolean(), server_default='0', nullable=False))
+
+    # Which existing /favicon.ico icons were declared is unknown: mark them all,
+    # and the first repair run clears the flag on the real ones
+    op.execute(sa.text(
+        "UPDATE articles SET favicon_guessed = :yes "
+        "WHERE favicon_url IS NULL OR favicon_url LIKE '%/favicon.ico'"
+    ).bindparams(yes=True))
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('favicon_guessed')
+
+    if bind.dialect.name == 'sqlite':
+        backend_for(bind.dialect.name).install(bind)
@@ -0,0 +1,31 @@
+"""article search
+
+Revision ID: c4d8f2a1e907
+Revises: a61c0d8e5b39
+Create Date: 2026-10-17 21:04:52.118273
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.search_utils import backend_for
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8f2a1e907'
+down_revision = 'a61c0d8e5b39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Postgres: generated tsvector column + GIN index. SQLite: FTS5 table with
+    # sync triggers, backfilled from existing rows. Later SQLite batch
+    # migrations that rebuild `articles` drop the triggers and must reinstall them.
+    bind = op.get_bind()
+    backend_for(bind.dialect.name).install(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    backend_for(bind.dialect.name).uninstall(bind)
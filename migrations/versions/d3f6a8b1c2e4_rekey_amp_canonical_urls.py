@@ -0,0 +1,50 @@
+"""rekey amp canonical urls
+
+Revision ID: d3f6a8b1c2e4
+Revises: b5e1d7c3a9f2
+Create Date: 2026-10-18 14:06:19.528304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.cache_utils import canonical_url
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f6a8b1c2e4'
+down_revision = 'b5e1d7c3a9f2'
+branch_labels = None
+depends_on = None
+
+BATCH = 1000
+
+
+def upgrade():
+    # canonical_url no longer folds amp.dev into "dev" or github.com/x/amp into
+    # github.com/x; recompute the keys in id order, BATCH at a time. A row whose
+    # new key is already saved by its user keeps the old one.
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, user_id, url, canonical_url FROM articles WHERE id > :last ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH}).all()
+        if not rows:
+            break
+        for r in rows:
+            key = canonical_url(r.url)
+            if key == r.canonical_url:
+                continue
+            taken = bind.execute(sa.text(
+                "SELECT 1 FROM articles WHERE user_id = :user_id AND canonical_url = :key"
+            ), {"user_id": r.user_id, "key": key}).first()
+            if not taken:
+                bind.execute(sa.text("UPDATE articles SET canonical_url = :key WHERE id = :id"),
+                             {"id": r.id, "key": key})
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # The finer keys are still unique per user; nothing to undo
+    pass
@@ -0,0 +1,26 @@
+"""library version
+
+Revision ID: e2b7a93c5d18
+Revises: c4d8f2a1e907
+Create Date: 2026-10-17 21:48:30.552914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7a93c5d18'
+down_revision = 'c4d8f2a1e907'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('library_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('library_version')
@@ -0,0 +1,41 @@
+"""article updated at
+
+Revision ID: f1a4c7e9b2d6
+Revises: d3f6a8b1c2e4
+Create Date: 2026-10-18 15:27:03.914682
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.search_utils import backend_for
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a4c7e9b2d6'
+down_revision = 'd3f6a8b1c2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN, so SQLite keeps the table (and its search triggers)
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_articles_user_updated', ['user_id', 'updated_at'], unique=False)
+
+    # When existing rows last changed is unknown (imports keep a backdated
+    # created_at): stamp them now, so the next `since=` export includes them all
+    op.execute(sa.text("UPDATE articles SET updated_at = :now").bindparams(now=datetime.utcnow()))
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index('ix_articles_user_updated')
+        batch_op.drop_column('updated_at')
+
+    if bind.dialect.name == 'sqlite':
+        backend_for(bind.dialect.name).install(bind)
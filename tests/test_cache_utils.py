@@ -0,0 +1,36 @@
+import pytest
+
+from utils.cache_utils import canonical_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.com/x", "https://example.com/x"),
+    ("Http://www.Example.com/x/", "https://example.com/x"),
+    ("example.com/x#top", "https://example.com/x"),
+    ("https://example.com/x?utm_source=a&id=2&fbclid=b", "https://example.com/x?id=2"),
+    ("https://example.com:8080/x", "https://example.com:8080/x"),
+])
+def test_canonical_url_normalizes(url, expected):
+    assert canonical_url(url) == expected
+
+
+@pytest.mark.parametrize("url", [
+    "https://www-theguardian-com.cdn.ampproject.org/c/s/www.theguardian.com/world/story/amp",
+    "https://www.google.com/amp/s/theguardian.com/world/story.amp",
+    "https://theguardian.com/world/story/amp?amp=1",
+    "https://theguardian.com/world/story.amp?outputType=amp",
+    "https://amp.theguardian.com/world/story",
+])
+def test_amp_variants_fold_into_the_page(url):
+    assert canonical_url(url) == "https://theguardian.com/world/story"
+
+
+@pytest.mark.parametrize("url", [
+    "https://amp.dev/documentation",
+    "https://amp.co.uk/documentation",
+    "https://github.com/ampproject/amp",
+    "https://shop.example/products/amp",
+    "https://example.com/releases/1.amp",
+])
+def test_amp_lookalikes_are_left_alone(url):
+    assert canonical_url(url) == url
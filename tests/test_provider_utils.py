@@ -0,0 +1,157 @@
+import importlib, json
+
+import pytest
+
+from utils import provider_utils
+from utils.cache_utils import canonical_url
+from utils.provider_utils import (DEFAULT, DOI, OEMBED, PDF, REWRITE, SCRAPE, SLUG, Provider, ProviderRegistry,
+                                  load_providers, registry, route)
+
+
+# ---- host matching ----
+
+@pytest.mark.parametrize("host, name", [
+    ("youtube.com", "youtube"),
+    ("m.youtube.com", "youtube"),
+    ("www.youtube.com", "youtube"),
+    ("WWW.YouTube.com.", "youtube"),
+    ("youtu.be", "youtu.be"),
+    ("open.spotify.com", "spotify"),
+    ("export.arxiv.org", "arxiv"),
+])
+def test_for_host_matches_label_suffixes(host, name):
+    assert registry.for_host(host).name == name
+
+
+@pytest.mark.parametrize("host", ["notyoutube.com", "youtube.com.evil.example", "spotify.com", "com", "", None])
+def test_for_host_falls_back_to_default(host):
+    assert registry.for_host(host) is DEFAULT
+
+
+def test_longest_suffix_wins():
+    reg = ProviderRegistry([Provider("site", ["example.com"]), Provider("blog", ["blog.example.com"])])
+    assert reg.for_host("a.blog.example.com").name == "blog"
+    assert reg.for_host("www.example.com").name == "site"
+
+
+# ---- route plans ----
+
+def test_oembed_provider_also_scrapes_the_page():
+    plan = route("https://www.youtube.com/watch?v=abc")
+    assert plan.provider.name == "youtube"
+    assert plan.strategies == (OEMBED, SCRAPE)
+    assert plan.oembed_url == ("https://www.youtube.com/oembed?url="
+                               "https%3A%2F%2Fwww.youtube.com%2Fwatch%3Fv%3Dabc&format=json")
+
+
+def test_arxiv_pdf_is_rewritten_to_the_abstract_page():
+    plan = route("https://arxiv.org/pdf/2101.00001v2.pdf")
+    assert plan.strategies == (REWRITE,)
+    assert plan.fetch_url == "https://arxiv.org/abs/2101.00001v2"
+
+
+def test_arxiv_abstract_is_scraped():
+    plan = route("https://arxiv.org/abs/2101.00001")
+    assert plan.strategies == (SCRAPE,)
+    assert plan.fetch_url is None
+
+
+@pytest.mark.parametrize("path", ["/doi/10.1002/abc.123", "/doi/full/10.1002/abc.123", "/doi/pdf/10.1002/abc.123"])
+def test_doi_path_uses_crossref_instead_of_the_page(path):
+    plan = route("https://onlinelibrary.wiley.com" + path)
+    assert plan.strategies == (DOI,)
+    assert plan.doi == "10.1002/abc.123"
+
+
+@pytest.mark.parametrize("url", ["https://example.com/paper.pdf", "https://example.com/files/PAPER.PDF",
+                                 "https://example.com/pdf/1234"])
+def test_pdf_paths(url):
+    assert route(url).strategies == (PDF,)
+
+
+def test_plain_page_is_scraped():
+    plan = route("https://example.com/2024/some-story")
+    assert plan.provider is DEFAULT
+    assert plan.strategies == (SCRAPE,)
+    assert (plan.oembed_url, plan.fetch_url, plan.doi) == (None, None, None)
+
+
+def test_slug_only_provider_skips_the_page():
+    plan = route("https://www.wsj.com/articles/fed-holds-rates-steady-1a2b3c")
+    assert plan.provider.name == "wsj"
+    assert plan.strategies == (SLUG,)
+    assert plan.provider.slug_trim
+
+
+def test_oembed_with_slug_fallback():
+    plan = route("https://x.com/someone/status/1")
+    assert plan.strategies == (OEMBED, SLUG)
+    assert plan.oembed_url.startswith("https://publish.twitter.com/oembed?url=https%3A%2F%2Fx.com")
+
+
+# ---- registry changes and canonical rules ----
+
+def test_add_replaces_a_provider_and_its_hosts():
+    reg = ProviderRegistry([Provider("video", ["video.example", "vid.example"], oembed="https://video.example/o?u={url}")])
+    reg.add(Provider("video", ["video.example"], scrape=False, slug=True))
+    assert reg.for_host("vid.example") is DEFAULT
+    assert reg.for_host("video.example").slug
+    assert reg.route("https://video.example/watch/a-clip").strategies == (SLUG,)
+    assert list(reg.providers) == ["video"]
+
+
+def test_add_does_not_touch_other_providers_on_the_same_trie_path():
+    reg = ProviderRegistry([Provider("site", ["example.com"]), Provider("blog", ["blog.example.com"])])
+    reg.add(Provider("site", ["example.org"]))
+    assert reg.for_host("blog.example.com").name == "blog"
+    assert reg.for_host("example.com") is DEFAULT
+
+
+@pytest.mark.parametrize("host, path, query, expected", [
+    ("youtu.be", "/abc", [("t", "10")], ("youtube.com", "/watch", [("v", "abc")])),
+    ("m.youtube.com", "/shorts/abc", [("feature", "share")], ("youtube.com", "/watch", [("v", "abc")])),
+    ("www.youtube.com", "/watch", [("v", "abc"), ("list", "PL1"), ("si", "x")],
+     ("youtube.com", "/watch", [("v", "abc"), ("list", "PL1")])),
+    ("arxiv.org", "/pdf/2101.00001v2.pdf", [], ("arxiv.org", "/abs/2101.00001v2", [])),
+    ("example.com", "/a", [("id", "1")], ("example.com", "/a", [("id", "1")])),
+])
+def test_canonical_rules(host, path, query, expected):
+    assert registry.canonical(host, path, query) == expected
+
+
+def test_canonical_url_folds_provider_variants():
+    assert (canonical_url("https://youtu.be/abc?t=10") == canonical_url("https://www.youtube.com/watch?v=abc")
+            == canonical_url("https://m.youtube.com/shorts/abc"))
+    assert canonical_url("https://arxiv.org/pdf/2101.00001.pdf") == canonical_url("https://arxiv.org/abs/2101.00001")
+
+
+# ---- PROVIDERS_FILE ----
+
+@pytest.fixture
+def providers_file(tmp_path):
+    path = tmp_path / "providers.json"
+    path.write_text(json.dumps([
+        {"name": "example-news", "hosts": ["news.example"], "scrape": False, "slug": True},
+        {"name": "medium", "hosts": ["medium.com"], "oembed": "https://medium.example/oembed?url={url}"},
+    ]))
+    return path
+
+
+def test_load_providers(providers_file):
+    providers = load_providers(providers_file)
+    assert [p.name for p in providers] == ["example-news", "medium"]
+    assert providers[0].slug and not providers[0].scrape
+
+
+def test_providers_file_env_extends_and_overrides_builtins(monkeypatch, providers_file):
+    monkeypatch.setenv("PROVIDERS_FILE", str(providers_file))
+    try:
+        module = importlib.reload(provider_utils)
+        assert module.route("https://www.news.example/2024/a-story").strategies == (SLUG,)
+        medium = module.provider_for_host("medium.com")
+        assert medium.oembed == "https://medium.example/oembed?url={url}"
+        assert not medium.slug_trim   # replaced, not merged
+        assert module.provider_for_host("youtube.com").name == "youtube"
+    finally:
+        monkeypatch.delenv("PROVIDERS_FILE")
+        importlib.reload(provider_utils)
@@ -0,0 +1,193 @@
+import hashlib, json, re, threading, time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from sqlalchemy import delete, insert, select, update
+
+from utils.provider_utils import registrable_domain, registry as provider_registry
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "cmpid", "smid", "smtyp", "_hsenc", "_hsmi",
+    "mkt_tok", "s_cid", "ncid", "ocid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hmb_")
+AMP_PARAMS = {"amp", "amp_js_v", "usqp"}
+# Google's AMP caches wrap the publisher URL: /c/s/<host>/<path> and /amp/s/<host>/<path>
+AMP_CACHE_PATH = re.compile(r"^/(?:[cv]/|amp/)(?:s/)?([^/]+)(/.*)?$")
+AMP_SUFFIX = re.compile(r"(?:/amp|\.amp)(?=/?$|\.html$)")
+
+
+def _unwrap_amp_cache(host, path):
+    if host.endswith(".cdn.ampproject.org") or (host == "google.com" and path.startswith("/amp/")):
+        m = AMP_CACHE_PATH.match(path)
+        if m:
+            host = m.group(1).lower()
+            if host.startswith("www."):
+                host = host[4:]
+            return host, m.group(2) or "/", True
+    return host, path, False
+
+
+def _is_amp_param(k, v):
+    return k.lower() in AMP_PARAMS or (k == "outputType" and v == "amp")
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL for cache keys and duplicate detection: https, no www.,
+    no fragment, no tracking params, AMP variants folded into the regular page,
+    then the provider's own rewrites (youtu.be, arXiv /pdf/ ...)."""
+    url = url.strip()
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+    p = urlparse(url)
+    host = (p.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = p.path or "/"
+    host, path, amp = _unwrap_amp_cache(host, path)
+    # amp.example.com is the AMP edition of example.com, but amp.dev is a site of its own
+    if host.startswith("amp.") and registrable_domain(host[4:]):
+        host = host[4:]
+    params = parse_qsl(p.query, keep_blank_values=True)
+    # a trailing /amp is only an AMP edition when something else says so (github.com/ampproject/amp is not);
+    # publishers that always use it can strip it with a provider canonical rule
+    if amp or any(_is_amp_param(k, v) for k, v in params):
+        path = AMP_SUFFIX.sub("", path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = [(k, v) for k, v in params
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+             and not _is_amp_param(k, v)]
+    host, path, query = provider_registry.canonical(host, path, query)
+    if p.port and p.port not in (80, 443):
+        host = f"{host}:{p.port}"
+    query.sort()
+    return urlunparse(("https", host, path, "", urlencode(query), ""))
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.negative_hits = self.sets = 0
+
+    def incr(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self):
+        served = self.hits + self.negative_hits
+        lookups = served + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+        }
+
+
+class MemoryCache:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_size=5000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLCache:
+    """Cache rows in a shared table (key, value, expires_at) so every worker sees them.
+
+    `engine` is a callable returning the SQLAlchemy engine (the app's engine is
+    only available inside an app context) and `table` the Table to use.
+    """
+
+    def __init__(self, engine, table):
+        self._engine = engine
+        self.table = table
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        t = self.table
+        with self._engine().connect() as conn:
+            row = conn.execute(
+                select(t.c.value).where(t.c.key == self._key(key), t.c.expires_at > datetime.utcnow())
+            ).first()
+        return json.loads(row.value) if row else None
+
+    def set(self, key, value, ttl):
+        t = self.table
+        values = {"value": json.dumps(value), "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}
+        with self._engine().begin() as conn:
+            updated = conn.execute(update(t).where(t.c.key == self._key(key)).values(**values)).rowcount
+            if not updated:
+                conn.execute(insert(t).values(key=self._key(key), **values))
+
+    def delete(self, key):
+        with self._engine().begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == self._key(key)))
+
+    def purge_expired(self):
+        with self._engine().begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+class TTLCache:
+    """Front for a backend that tracks hit/miss counts and negative entries."""
+
+    def __init__(self, backend, namespace):
+        self.backend = backend
+        self.namespace = namespace
+        self.stats = CacheStats()
+
+    def get(self, key, allow_negative=True):
+        try:
+            entry = self.backend.get(f"{self.namespace}:{key}")
+        except Exception:
+            entry = None
+        if entry is None or (entry.get("negative") and not allow_negative):
+            self.stats.incr("misses")
+            return None
+        self.stats.incr("negative_hits" if entry.get("negative") else "hits")
+        return entry
+
+    def set(self, key, value, ttl, negative=False):
+        try:
+            self.backend.set(f"{self.namespace}:{key}", dict(value, negative=negative), ttl)
+            self.stats.incr("sets")
+        except Exception:
+            pass
+
+    def delete(self, key):
+        self.backend.delete(f"{self.namespace}:{key}")
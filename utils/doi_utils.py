@@ -1,19 +1,38 @@
-import re, requests
+from urllib.parse import urlparse
+from utils.http_utils import http_get, http_get_async
+from utils.metrics_utils import span, timed
+from utils.provider_utils import DOI_PATH
+
+CROSSREF_HOST = "api.crossref.org"
+
 def extract_doi_from_url(url: str) -> str | None:
-    m = re.search(r'/doi/(?:abs/|full/|pdf/|suppl/)?(10\.\d{4,9}/[^\s/]+)', url)
+    m = DOI_PATH.search(urlparse(url).path)
     if m:
         return m.group(1)
     return None
 
+@timed("doi")
 def fetch_doi_metadata(doi: str) -> str | None:
-    api_url = f"https://api.crossref.org/works/{doi}"
     try:
-        r = requests.get(api_url, headers={"Accept": "application/json"}, timeout=1)
-        if r.status_code == 200:
-            data = r.json()
-            title_list = data.get("message", {}).get("title", [])
-            if title_list:
-                return title_list[0].strip()
+        r = http_get(f"https://{CROSSREF_HOST}/works/{doi}", stage="doi", headers={"Accept": "application/json"})
+        return _crossref_title(r)
     except:
         pass
+    return None
+
+async def fetch_doi_metadata_async(doi: str) -> str | None:
+    with span("doi"):
+        try:
+            r = await http_get_async(f"https://{CROSSREF_HOST}/works/{doi}", stage="doi",
+                                     headers={"Accept": "application/json"})
+            return _crossref_title(r)
+        except:
+            pass
+    return None
+
+def _crossref_title(r):
+    if r.status_code == 200:
+        title_list = r.json().get("message", {}).get("title", [])
+        if title_list:
+            return title_list[0].strip()
     return None
\ No newline at end of file
@@ -0,0 +1,58 @@
+import calendar, csv, html, io, json
+
+FIELDS = ("id", "url", "title", "publisher", "favicon_url", "created_at", "date_read")
+
+FORMATS = {
+    # name: (mimetype, file extension)
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "csv": ("text/csv", "csv"),
+    "html": ("text/html", "html"),
+}
+
+
+def _iso(dt):
+    return dt.isoformat() + "Z" if dt else None
+
+
+def _epoch(dt):
+    return str(calendar.timegm(dt.timetuple())) if dt else ""
+
+
+def iter_jsonl(rows):
+    for r in rows:
+        d = {f: getattr(r, f) for f in FIELDS}
+        d["created_at"], d["date_read"] = _iso(r.created_at), _iso(r.date_read)
+        yield json.dumps(d, ensure_ascii=False) + "\n"
+
+
+def iter_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def take():
+        out = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return out
+
+    writer.writerow(FIELDS)
+    yield take()
+    for r in rows:
+        writer.writerow([r.id, r.url, r.title or "", r.publisher or "", r.favicon_url or "",
+                         _iso(r.created_at) or "", _iso(r.date_read) or ""])
+        yield take()
+
+
+def iter_netscape(rows):
+    """Netscape bookmark file, importable by browsers (and by our own /import)."""
+    yield ("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+           '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+           "<TITLE>someday times</TITLE>\n<H1>someday times</H1>\n<DL><p>\n")
+    for r in rows:
+        tags = ' TAGS="read"' if r.date_read else ""
+        yield (f'    <DT><A HREF="{html.escape(r.url)}" ADD_DATE="{_epoch(r.created_at)}"{tags}>'
+               f"{html.escape(r.title or r.url)}</A>\n")
+    yield "</DL><p>\n"
+
+
+WRITERS = {"jsonl": iter_jsonl, "csv": iter_csv, "html": iter_netscape}
@@ -0,0 +1,124 @@
+import codecs, os
+from html.parser import HTMLParser
+
+HEAD_MAX_BYTES = int(os.getenv("HEAD_MAX_BYTES", str(256 * 1024)))
+CHUNK_SIZE = 8192
+
+
+class PageHead:
+    """What we read from a page's <head>: title, meta tags and <link> tags."""
+
+    def __init__(self, url):
+        self.url = url
+        self.title = None
+        self.meta = {}     # property/name -> content, first one wins
+        self.links = []    # dicts with rel, href, sizes, type
+
+    def links_with_rel(self, word):
+        return [l for l in self.links if word in l["rel"]]
+
+
+class _HeadParser(HTMLParser):
+    def __init__(self, head):
+        super().__init__(convert_charrefs=True)
+        self.head = head
+        self.done = False
+        self._in_title = False
+        self._title = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "body":
+            self.done = True
+            return
+        a = {k: (v or "") for k, v in attrs}
+        if tag == "title" and self.head.title is None:
+            self._in_title = True
+        elif tag == "meta":
+            key = (a.get("property") or a.get("name") or "").lower()
+            if key and a.get("content") and key not in self.head.meta:
+                self.head.meta[key] = a["content"]
+        elif tag == "link" and a.get("href"):
+            self.head.links.append({
+                "rel": a.get("rel", "").lower(),
+                "href": a["href"],
+                "sizes": a.get("sizes") or None,
+                "type": a.get("type", "").lower(),
+            })
+
+    handle_startendtag = handle_starttag
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            self.head.title = "".join(self._title)
+        elif tag == "head":
+            self.done = True
+
+
+def _charset(resp):
+    ctype = resp.headers.get("Content-Type") or ""
+    for part in ctype.split(";")[1:]:
+        k, _, v = part.strip().partition("=")
+        if k.lower() == "charset" and v:
+            try:
+                codecs.lookup(v.strip('"'))
+                return v.strip('"')
+            except LookupError:
+                break
+    return "utf-8"
+
+
+class _HeadReader:
+    """Incremental <head> parsing shared by the sync and async readers."""
+
+    def __init__(self, resp, max_bytes):
+        self.head = PageHead(getattr(resp, "logical_url", None) or str(resp.url))
+        self.parser = _HeadParser(self.head)
+        self.decoder = codecs.getincrementaldecoder(_charset(resp))(errors="replace")
+        self.max_bytes = max_bytes
+        self.read = 0
+
+    def feed(self, chunk):
+        """Returns True once nothing more needs to be read."""
+        self.read += len(chunk)
+        self.parser.feed(self.decoder.decode(chunk))
+        return self.parser.done or self.read >= self.max_bytes
+
+    def result(self):
+        if self.parser._in_title:
+            self.head.title = "".join(self.parser._title)
+        return self.head
+
+
+def read_head(resp, max_bytes=HEAD_MAX_BYTES):
+    """Parse only the <head> of a streamed response, reading at most max_bytes.
+
+    The response should come from a `stream=True` request; it is closed once
+    </head> (or <body>) is seen so the rest of the page is never downloaded.
+    """
+    reader = _HeadReader(resp, max_bytes)
+    try:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            if reader.feed(chunk):
+                break
+    finally:
+        resp.close()
+    return reader.result()
+
+
+async def read_head_async(resp, max_bytes=HEAD_MAX_BYTES):
+    """read_head for a streamed httpx response (see http_utils.http_get_async)."""
+    reader = _HeadReader(resp, max_bytes)
+    try:
+        async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+            if reader.feed(chunk):
+                break
+    finally:
+        await resp.aclose()
+    return reader.result()
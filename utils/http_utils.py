@@ -0,0 +1,299 @@
+import asyncio, os, threading, time, weakref
+from collections import deque
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.cache_utils import TTLCache
+from utils.metrics_utils import registry, sample_lines
+
+# Per-stage timeout budgets in seconds; override with FETCH_TIMEOUT_<STAGE>=<seconds>
+TIMEOUTS = {
+    "oembed": 3.0,
+    "page": 1.0,
+    "manifest": 0.5,
+    "doi": 1.0,
+    "icon": 1.0,
+    "pdf": 2.0,
+}
+for _stage in TIMEOUTS:
+    if os.getenv(f"FETCH_TIMEOUT_{_stage.upper()}"):
+        TIMEOUTS[_stage] = float(os.environ[f"FETCH_TIMEOUT_{_stage.upper()}"])
+
+POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "100"))      # hosts kept in the pool
+POOL_PER_HOST = int(os.getenv("FETCH_POOL_PER_HOST", "8"))  # max open connections per host
+ASYNC_MAX_CONNECTIONS = int(os.getenv("FETCH_ASYNC_CONNECTIONS", "200"))  # per event loop
+RETRIES = int(os.getenv("FETCH_RETRIES", "1"))
+BACKOFF = float(os.getenv("FETCH_BACKOFF", "0.2"))
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))      # consecutive failures that open a host's circuit
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))   # seconds before one probe request is let through
+BREAKER_SYNC = 5.0          # seconds between checks of the shared store, per host
+ADAPTIVE_MIN_SAMPLES = 20   # latencies needed before a host's timeout adapts
+ADAPTIVE_FACTOR = 3.0       # timeout = factor * p95, between ADAPTIVE_FLOOR and the stage budget
+ADAPTIVE_FLOOR = 0.25
+
+# Test hook: when set, every fetch goes to <override>/<host><path>?<query>
+# instead of the real host (see set_upstream_override).
+_upstream_override = os.getenv("FETCH_UPSTREAM") or None
+
+_adapter = None
+_adapter_pid = None
+_adapter_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host whose circuit is open."""
+
+
+class _HostHealth:
+    def __init__(self):
+        self.latencies = deque(maxlen=100)
+        self.failures = 0
+        self.open_until = 0.0    # monotonic; 0 when closed
+        self.probing = False     # half-open: one request in flight decides
+        self.synced_at = 0.0
+        self.p95 = None
+
+
+class CircuitBreakers:
+    """Per-host failure tracking and latency stats, shared by every thread in the process.
+
+    After BREAKER_FAILURES consecutive failures (connection errors, timeouts,
+    5xx/429) a host is skipped for BREAKER_COOLDOWN seconds, then a single
+    probe decides whether it closes again. With a shared `store` (a TTLCache),
+    opening a circuit is also published there so other workers skip the host
+    too.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.store = None
+        self.opened = self.rejected = 0
+
+    def _health(self, host):
+        h = self._hosts.get(host)
+        if h is None:
+            h = self._hosts.setdefault(host, _HostHealth())
+        return h
+
+    def is_open(self, host):
+        """True while the host is cooling down (a half-open host counts as closed)."""
+        h = self._hosts.get(host)
+        return bool(h and h.open_until > time.monotonic())
+
+    def allow(self, host):
+        now = time.monotonic()
+        with self._lock:
+            h = self._health(host)
+            if h.open_until:
+                if h.open_until > now or h.probing:
+                    self.rejected += 1
+                    return False
+                h.probing = True
+                return True
+            sync = self.store is not None and now - h.synced_at > BREAKER_SYNC
+            if sync:
+                h.synced_at = now
+        if sync:
+            entry = self.store.get(host)
+            remaining = entry["until"] - time.time() if entry else 0
+            if remaining > 0:
+                with self._lock:
+                    h.open_until = now + remaining
+                    self.rejected += 1
+                return False
+        return True
+
+    def record(self, host, ok, latency=None):
+        opened = False
+        with self._lock:
+            h = self._health(host)
+            if ok:
+                h.failures, h.open_until, h.probing = 0, 0.0, False
+                if latency is not None:
+                    h.latencies.append(latency)
+                    if len(h.latencies) >= ADAPTIVE_MIN_SAMPLES and len(h.latencies) % 10 == 0:
+                        ordered = sorted(h.latencies)
+                        h.p95 = ordered[int(len(ordered) * 0.95) - 1]
+            else:
+                h.failures += 1
+                if h.probing or h.failures >= BREAKER_FAILURES:
+                    h.open_until, h.probing, h.failures = time.monotonic() + BREAKER_COOLDOWN, False, 0
+                    self.opened += 1
+                    opened = True
+        if opened and self.store is not None:
+            self.store.set(host, {"until": time.time() + BREAKER_COOLDOWN}, BREAKER_COOLDOWN)
+
+    def release(self, host):
+        with self._lock:
+            self._health(host).probing = False
+
+    def timeout(self, host, budget):
+        h = self._hosts.get(host)
+        if h is None or h.p95 is None:
+            return budget
+        return min(budget, max(ADAPTIVE_FLOOR, ADAPTIVE_FACTOR * h.p95))
+
+    def open_hosts(self):
+        now = time.monotonic()
+        return sorted(host for host, h in list(self._hosts.items()) if h.open_until > now)
+
+
+breakers = CircuitBreakers()
+
+
+def configure_breaker_store(backend):
+    """Share open circuits across processes through a cache backend (see cache_utils)."""
+    breakers.store = TTLCache(backend, "breaker")
+
+
+def _breaker_lines():
+    yield from sample_lines("someday_circuit_open_hosts", "gauge", "Hosts whose circuit is open",
+                            [({}, len(breakers.open_hosts()))])
+    yield from sample_lines("someday_circuit_events_total", "counter", "Circuits opened and requests skipped",
+                            [({"event": "opened"}, breakers.opened), ({"event": "rejected"}, breakers.rejected)])
+
+registry.collectors.append(_breaker_lines)
+
+
+def set_upstream_override(base_url):
+    global _upstream_override
+    _upstream_override = base_url.rstrip("/") if base_url else None
+
+
+def _make_adapter():
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=0,
+        status=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    return HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST,
+                       pool_block=True, max_retries=retry)
+
+
+def get_adapter():
+    """The process-wide connection pool (rebuilt after fork so workers never share sockets)."""
+    global _adapter, _adapter_pid
+    if _adapter_pid != os.getpid():
+        with _adapter_lock:
+            if _adapter_pid != os.getpid():
+                _adapter = _make_adapter()
+                _adapter_pid = os.getpid()
+    return _adapter
+
+
+def new_session():
+    # A fresh Session per fetch keeps cookie jars separate (as module-level
+    # requests.get did) while the shared adapter keeps connections alive.
+    s = requests.Session()
+    adapter = get_adapter()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def _rewrite(url):
+    if not _upstream_override or url.startswith(_upstream_override):
+        return url
+    p = urlparse(url)
+    return f"{_upstream_override}/{p.hostname}{p.path or '/'}" + (f"?{p.query}" if p.query else "")
+
+
+def _logical(fetched, url):
+    """The URL a response stands for: `fetched` (after any redirects) with the
+    FETCH_UPSTREAM rewrite undone, so links resolve against the real site."""
+    fetched = str(fetched)
+    if not _upstream_override:
+        return fetched
+    if fetched == _rewrite(url):
+        return url
+    prefix = _upstream_override + "/"
+    if fetched.startswith(prefix):
+        return f"{urlparse(url).scheme or 'https'}://{fetched[len(prefix):]}"
+    return fetched
+
+
+def http_get(url, stage="page", timeout=None, **kwargs):
+    """requests.get through the shared pool, guarded by the host's circuit breaker.
+
+    The timeout is the stage's budget (or `timeout`), tightened to a multiple
+    of the host's recent p95 once enough requests have been seen. Raises
+    CircuitOpenError without touching the network while the host is failing.
+    `resp.logical_url` is the final URL as the site sees it, also under
+    FETCH_UPSTREAM (read_head resolves links against it).
+    """
+    host = urlparse(url).hostname or ""
+    if not breakers.allow(host):
+        raise CircuitOpenError(f"circuit open for {host}")
+    try:
+        resp = new_session().get(_rewrite(url), timeout=breakers.timeout(host, timeout or TIMEOUTS[stage]), **kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+        breakers.record(host, False)
+        raise
+    except Exception:
+        breakers.release(host)   # not the host's fault (bad URL etc.); let another probe through
+        raise
+    breakers.record(host, resp.status_code < 500 and resp.status_code != 429, resp.elapsed.total_seconds())
+    resp.logical_url = _logical(resp.url, url)
+    return resp
+
+
+# ---- asyncio ----
+# One httpx.AsyncClient per event loop; the breakers and upstream override are
+# shared with the requests path above.
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=POOL_HOSTS),
+            transport=httpx.AsyncHTTPTransport(retries=RETRIES),
+        )
+    return client
+
+
+async def close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def http_get_async(url, stage="page", timeout=None, stream=False, headers=None):
+    """http_get for asyncio callers, returning an httpx.Response.
+
+    With stream=True the body is not read; the caller must `await resp.aclose()`.
+    """
+    host = urlparse(url).hostname or ""
+    if not breakers.allow(host):
+        raise CircuitOpenError(f"circuit open for {host}")
+    client = get_async_client()
+    start = time.perf_counter()
+    try:
+        request = client.build_request("GET", _rewrite(url), headers=headers,
+                                       timeout=breakers.timeout(host, timeout or TIMEOUTS[stage]))
+        resp = await client.send(request, stream=stream)
+    except httpx.TransportError:
+        breakers.record(host, False)
+        raise
+    except BaseException:
+        breakers.release(host)
+        raise
+    breakers.record(host, resp.status_code < 500 and resp.status_code != 429, time.perf_counter() - start)
+    resp.logical_url = _logical(resp.url, url)
+    return resp
@@ -1,7 +1,46 @@
-import requests
 from urllib.parse import urlparse, urljoin
 
-from bs4 import BeautifulSoup
+from utils.cache_utils import MemoryCache, TTLCache
+from utils.http_utils import http_get, http_get_async
+from utils.html_utils import read_head
+from utils.metrics_utils import span
+from utils.provider_utils import site_of
+
+ICON_TTL = 7 * 86400          # host -> resolved icon URL
+ICON_MAX_BYTES = 100_000      # larger icons are linked, not stored
+
+# The best icon is a property of the host, not the page, so remember it per host
+host_icon_cache = TTLCache(MemoryCache(max_size=2000), "icon")
+
+def same_site(a, b):
+    return site_of(a) == site_of(b)
+
+def configure_icon_cache(backend):
+    host_icon_cache.backend = backend
+
+def cached_host_icon(host):
+    entry = host_icon_cache.get(host) if host else None
+    return entry["url"] if entry else None
+
+def _remember(host, best, guessed):
+    if host:
+        host_icon_cache.set(host, {"url": best, "guessed": guessed}, ICON_TTL)
+
+def _cached_entry(host):
+    entry = host_icon_cache.get(host) if host else None
+    # entries cached before "guessed" was recorded are resolved again
+    return entry if entry and "guessed" in entry else None
+
+def guessed_icon(url):
+    """True for no icon, or a /favicon.ico that the host's page did not declare
+    (the fallback); a site whose real icon is /favicon.ico is not a guess."""
+    if not url:
+        return True
+    parsed = urlparse(url)
+    if parsed.path != "/favicon.ico":
+        return False
+    entry = _cached_entry(parsed.hostname)
+    return not entry or entry["guessed"] or entry["url"] != url
 
 def pick_largest_icon(icons, base):
     best = None
@@ -24,36 +63,146 @@ def pick_largest_icon(icons, base):
             best = urljoin(base, href)
     return best
 
-def resolve_best_icon(resp, soup):
-    parsed = urlparse(resp.url)
-    base = f"{parsed.scheme}://{parsed.hostname}"
-    link_svg = soup.find("link", rel=lambda v: v and "icon" in v.lower(),
-                         type=lambda t: t and "svg" in (t or "").lower())
-    if link_svg and link_svg.get("href"):
+def resolve_best_icon(head):
+    """Best icon URL for a page, given its parsed <head> (see html_utils.read_head)."""
+    parsed = urlparse(head.url)
+    cached = _cached_entry(parsed.hostname)
+    if cached:
+        return cached["url"]
+    with span("icon"):
+        best = _resolve_best_icon(head)
+    _remember(parsed.hostname, best or _fallback_icon(head), best is None)
+    return best or _fallback_icon(head)
+
+async def resolve_best_icon_async(head):
+    parsed = urlparse(head.url)
+    cached = _cached_entry(parsed.hostname)
+    if cached:
+        return cached["url"]
+    with span("icon"):
+        best = _icon_from_links(head)
+        if not best:
+            manifest = _manifest_url(head)
+            if manifest:
+                try:
+                    with span("manifest"):
+                        m = await http_get_async(manifest, stage="manifest")
+                        best = _icon_from_manifest(m, head)
+                except:
+                    pass
+    _remember(parsed.hostname, best or _fallback_icon(head), best is None)
+    return best or _fallback_icon(head)
+
+def _base(head):
+    parsed = urlparse(head.url)
+    return f"{parsed.scheme}://{parsed.hostname}"
+
+def _fallback_icon(head):
+    return f"{_base(head)}/favicon.ico"
+
+def _icon_from_links(head):
+    base = _base(head)
+    icon_links = head.links_with_rel("icon")
+    link_svg = next((l for l in icon_links if "svg" in l["type"]), None)
+    if link_svg:
         return urljoin(base, link_svg["href"])
-    apple_links = soup.find_all("link", rel=lambda v: v and "apple-touch-icon" in v.lower())
-    apple_icons = [(l.get("href"), l.get("sizes")) for l in apple_links if l.get("href")]
+    apple_icons = [(l["href"], l["sizes"]) for l in head.links_with_rel("apple-touch-icon")]
     if apple_icons:
         best = pick_largest_icon(apple_icons, base)
         if best:
             return best
-    icon_links = soup.find_all("link", rel=lambda v: v and "icon" in v.lower())
-    icon_icons = [(l.get("href"), l.get("sizes")) for l in icon_links if l.get("href")]
+    icon_icons = [(l["href"], l["sizes"]) for l in icon_links]
     if icon_icons:
         best = pick_largest_icon(icon_icons, base)
         if best:
             return best
-    manifest_link = soup.find("link", rel=lambda v: v and "manifest" in v.lower())
-    if manifest_link and manifest_link.get("href"):
-        murl = urljoin(base, manifest_link["href"])
+    return None
+
+def _manifest_url(head):
+    manifest_links = head.links_with_rel("manifest")
+    return urljoin(_base(head), manifest_links[0]["href"]) if manifest_links else None
+
+def _icon_from_manifest(m, head):
+    data = m.json() if m.status_code < 400 else None
+    if data:
+        icons = [(ic.get("src"), ic.get("sizes")) for ic in data.get("icons", []) if ic.get("src")]
+        return pick_largest_icon(icons, _base(head))
+    return None
+
+def _resolve_best_icon(head):
+    best = _icon_from_links(head)
+    if best:
+        return best
+    murl = _manifest_url(head)
+    if murl:
         try:
-            m = requests.get(murl, timeout=0.5)
-            if m.status_code < 400:
-                data = m.json()
-                icons = [(ic.get("src"), ic.get("sizes")) for ic in data.get("icons", []) if ic.get("src")]
-                best = pick_largest_icon(icons, base)
-                if best:
-                    return best
+            with span("manifest"):
+                best = _icon_from_manifest(http_get(murl, stage="manifest"), head)
+            if best:
+                return best
         except:
             pass
-    return f"{base}/favicon.ico"
\ No newline at end of file
+    return None
+
+def resolve_host_icon(host, headers=None):
+    """Icon URL for a bare host, fetching its home page only when not cached."""
+    cached = cached_host_icon(host)
+    if cached:
+        return cached
+    try:
+        resp = http_get(f"https://{host}/", stage="page", headers=headers, stream=True)
+        if resp.status_code < 400:
+            return resolve_best_icon(read_head(resp))
+        resp.close()
+    except:
+        pass
+    return f"https://{host}/favicon.ico"
+
+# Formats /icon/<host> may serve from the app's own origin, told apart by their
+# bytes rather than the upstream Content-Type. Anything else, SVG above all
+# (it can carry script), is linked to instead of proxied.
+RASTER_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\x00\x00\x01\x00", "image/x-icon"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+]
+
+def raster_type(body):
+    """Content-Type for a PNG, ICO, GIF, JPEG or WebP body, else None."""
+    if not body:
+        return None
+    for magic, ctype in RASTER_SIGNATURES:
+        if body.startswith(magic):
+            return ctype
+    if body[:4] == b"RIFF" and body[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def download_icon(url, etag=None, max_bytes=ICON_MAX_BYTES):
+    """Conditional GET of an icon. Returns (status, content, content_type, etag).
+
+    status is 304 when `etag` still matches; content is None when the body is
+    missing, larger than max_bytes or not a raster image (see raster_type),
+    and content_type is the sniffed type, not the upstream one.
+    """
+    req_headers = {"If-None-Match": etag} if etag else {}
+    try:
+        with http_get(url, stage="icon", headers=req_headers, stream=True) as r:
+            if r.status_code == 304 or r.status_code >= 400:
+                return r.status_code, None, None, etag
+            ctype = (r.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if ctype and not (ctype.startswith("image/") or ctype == "application/octet-stream"):
+                return r.status_code, None, None, None
+            body = b""
+            for chunk in r.iter_content(8192):
+                body += chunk
+                if len(body) > max_bytes:
+                    return r.status_code, None, None, None
+            ctype = raster_type(body)
+            if not ctype:
+                return r.status_code, None, None, None
+            return r.status_code, body, ctype, r.headers.get("ETag")
+    except:
+        return 599, None, None, etag
@@ -0,0 +1,173 @@
+import csv, io
+from collections import namedtuple
+from datetime import datetime
+from html.parser import HTMLParser
+
+ImportedLink = namedtuple("ImportedLink", "url title added_at read_at")
+
+FORMATS = ("netscape", "pocket_csv", "instapaper_csv", "text")
+CHUNK_SIZE = 64 * 1024
+
+
+def _timestamp(value):
+    try:
+        ts = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    if ts <= 0:
+        return None
+    return datetime.utcfromtimestamp(ts)
+
+
+def _http_url(url):
+    url = (url or "").strip()
+    return url if url.startswith(("http://", "https://")) else None
+
+
+def detect_format(head: str, filename: str = "") -> str:
+    """Guess the export format from the first few KB of the file."""
+    name = filename.lower()
+    if name.endswith(".txt"):
+        return "text"
+    sample = head.lstrip("\ufeff").lstrip().lower()
+    first_line = sample.split("\n", 1)[0]
+    if sample.startswith("<") or "<a href" in sample[:4096]:
+        return "netscape"   # browser bookmarks and Pocket's HTML export share the <a href> layout
+    if "url" in first_line and "," in first_line:
+        return "instapaper_csv" if "selection" in first_line or "folder" in first_line else "pocket_csv"
+    return "text"
+
+
+class _BookmarkParser(HTMLParser):
+    """Netscape bookmark HTML (browsers, Instapaper) and Pocket's ril_export.html.
+
+    Pocket puts archived items under an <h1>Read Archive</h1>; browsers only
+    carry ADD_DATE.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._current = None
+        self._heading = None
+        self._in_archive = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            a = dict(attrs)
+            self._current = {"url": a.get("href"), "title": [],
+                             "added": a.get("add_date") or a.get("time_added")}
+        elif tag in ("h1", "h2", "h3"):
+            self._heading = []
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current["title"].append(data)
+        elif self._heading is not None:
+            self._heading.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._current is not None:
+            c, self._current = self._current, None
+            url = _http_url(c["url"])
+            if url:
+                added = _timestamp(c["added"])
+                title = " ".join("".join(c["title"]).split()) or None
+                self.links.append(ImportedLink(url, title, added,
+                                               (added or datetime.utcnow()) if self._in_archive else None))
+        elif tag in ("h1", "h2", "h3") and self._heading is not None:
+            self._in_archive = "archive" in "".join(self._heading).lower()
+            self._heading = None
+
+
+def _iter_html(text_stream):
+    parser = _BookmarkParser()
+    while True:
+        chunk = text_stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.links
+        parser.links.clear()
+    parser.close()
+    yield from parser.links
+
+
+def _iter_pocket_csv(text_stream):
+    # title,url,time_added,tags,status
+    for row in csv.DictReader(text_stream):
+        url = _http_url(row.get("url"))
+        if url:
+            added = _timestamp(row.get("time_added"))
+            read = (added or datetime.utcnow()) if (row.get("status") or "").lower() == "archive" else None
+            yield ImportedLink(url, (row.get("title") or "").strip() or None, added, read)
+
+
+def _iter_instapaper_csv(text_stream):
+    # URL,Title,Selection,Folder,Timestamp
+    for row in csv.DictReader(text_stream):
+        url = _http_url(row.get("URL"))
+        if url:
+            added = _timestamp(row.get("Timestamp"))
+            read = (added or datetime.utcnow()) if (row.get("Folder") or "").lower() == "archive" else None
+            yield ImportedLink(url, (row.get("Title") or "").strip() or None, added, read)
+
+
+def _iter_text(text_stream):
+    for line in text_stream:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        url = _http_url(line if "://" in line else "https://" + line)
+        if url and " " not in url:
+            yield ImportedLink(url, None, None, None)
+
+
+def iter_links(stream, fmt=None, filename=""):
+    """Yield ImportedLink rows from a binary file-like object without reading it all.
+
+    `fmt` is one of FORMATS; when omitted it is detected from the first bytes.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    if fmt is None:
+        head = text_stream.read(4096)
+        fmt = detect_format(head, filename)
+        text_stream = _Prefixed(head, text_stream)
+    parse = {
+        "netscape": _iter_html,
+        "pocket_csv": _iter_pocket_csv,
+        "instapaper_csv": _iter_instapaper_csv,
+        "text": _iter_text,
+    }[fmt]
+    yield from parse(text_stream)
+
+
+class _Prefixed(io.TextIOBase):
+    """A text stream with already-consumed text pushed back in front of it."""
+
+    def __init__(self, prefix, stream):
+        self._buf = io.StringIO(prefix)
+        self._stream = stream
+
+    def read(self, size=-1):
+        data = self._buf.read(size)
+        if size is None or size < 0:
+            return data + self._stream.read()
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+    def readline(self, size=-1):
+        line = self._buf.readline(size)
+        if line.endswith("\n") or (size is not None and 0 <= size <= len(line)):
+            return line
+        return line + self._stream.readline(-1 if size is None or size < 0 else size - len(line))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
@@ -1,10 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from urllib.parse import urlparse, urljoin
-import string, html, requests
-from bs4 import BeautifulSoup
-from utils.pdf_utils import is_pdf_url, try_pdf_title
-from utils.doi_utils import extract_doi_from_url, fetch_doi_metadata
-from utils.oembed_utils import try_oembed
-from utils.icon_utils import resolve_best_icon
+import asyncio, os, string, html, threading, time
+from utils.html_utils import PageHead, read_head, read_head_async
+from utils.pdf_utils import is_pdf_url, pdf_title_from_response, pdf_title_from_response_async
+from utils.doi_utils import CROSSREF_HOST, fetch_doi_metadata, fetch_doi_metadata_async
+from utils.oembed_utils import try_oembed, try_oembed_async
+from utils.provider_utils import OEMBED, REWRITE, SCRAPE, PDF, SLUG, route, provider_for_host
+from utils.icon_utils import resolve_best_icon, resolve_best_icon_async, cached_host_icon
+from utils.cache_utils import MemoryCache, TTLCache, canonical_url
+from utils.http_utils import breakers, http_get, http_get_async
+from utils.metrics_utils import span, strategy_total
 
 HEADERS = {
     "User-Agent": (
@@ -18,12 +24,35 @@ HEADERS = {
     "Pragma": "no-cache",
 }
 
-PARSEABLE_SLUGS = {
-    "wsj.com",
-    "washingtonpost.com",
-    "facebook.com",
-    "x.com"
-}
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "4"))   # hard cap for one fetch_metadata call
+FETCH_THREADS = int(os.getenv("FETCH_THREADS", "16"))       # pool floor; fetch_threads() grows it
+STRATEGIES_PER_FETCH = 4   # oEmbed, rewrite, DOI and page GET can all be in flight for one URL
+
+# FETCH_DEADLINE counts from submit, so a strategy queued behind other callers'
+# fetches eats its budget waiting for a thread: the pool is sized for every
+# fetch_metadata caller currently running (see fetch_threads)
+_executor = ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix="fetch")
+_pool_size = FETCH_THREADS
+_callers = 0
+_pool_lock = threading.Lock()
+
+@contextmanager
+def fetch_threads(callers=1):
+    """Declare `callers` threads that will call fetch_metadata concurrently inside
+    the block; the shared pool grows (it never shrinks) to start all of their
+    strategies at once."""
+    global _executor, _pool_size, _callers
+    with _pool_lock:
+        _callers += callers
+        if _callers * STRATEGIES_PER_FETCH > _pool_size:
+            # futures already submitted finish on the old pool
+            _pool_size = _callers * STRATEGIES_PER_FETCH
+            _executor = ThreadPoolExecutor(max_workers=_pool_size, thread_name_prefix="fetch")
+    try:
+        yield
+    finally:
+        with _pool_lock:
+            _callers -= callers
 
 def slug_to_title(url_path: str, publisher: str) -> str:
     candidate = url_path.strip("/").split("/")[-1]
@@ -31,7 +60,7 @@ def slug_to_title(url_path: str, publisher: str) -> str:
     candidate = candidate.replace(".html", "").replace(".htm", "")
     candidate = candidate.replace("_", " ").replace("-", " ")
 
-    if publisher in {"wsj.com", "medium.com"}:
+    if provider_for_host(publisher).slug_trim:
         candidate = " ".join(candidate.split(" ")[:-1])
     candidate = " ".join(candidate.split())
     if not candidate:
@@ -48,85 +77,291 @@ def slug_to_title(url_path: str, publisher: str) -> str:
             out.append(w_clean.capitalize())
     return " ".join(out)
 
-def extract_title(soup: BeautifulSoup) -> str | None:
-    meta = soup.find("meta", property="og:title") or soup.find("meta", attrs={"name": "og:title"})
-    if meta and meta.get("content"):
-        return meta["content"].strip()
-
-    if soup.title and soup.title.string:
-        return soup.title.string.strip()
+def extract_title(head: PageHead) -> str | None:
+    if head.meta.get("og:title", "").strip():
+        return head.meta["og:title"].strip()
+    if head.title and head.title.strip():
+        return head.title.strip()
     return None
 
-def fetch_metadata(target_url: str):
+def placeholder_metadata(target_url: str):
+    """Best guess (url, publisher, favicon) computed without any network I/O."""
     if not target_url.startswith(("http://", "https://")):
         target_url = "https://" + target_url
-
-    title = None
     p = urlparse(target_url)
     publisher = (p.hostname or "").replace("www.", "") or "—"
     favicon_url = f"{p.scheme or 'https'}://{p.hostname}/favicon.ico" if p.hostname else None
+    return target_url, publisher, favicon_url
+
+# Seconds to keep a result, by the strategy that produced it. "none" is the
+# negative entry written when every strategy failed.
+SOURCE_TTLS = {
+    "oembed": 7 * 86400,
+    "rewrite": 30 * 86400,
+    "doi": 30 * 86400,
+    "pdf": 30 * 86400,
+    "scrape": 86400,
+    "slug": 3600,
+    "none": 600,
+}
+
+metadata_cache = TTLCache(MemoryCache(max_size=5000), "meta")
+
+def configure_metadata_cache(backend):
+    metadata_cache.backend = backend
+
+def cached_metadata(target_url: str):
+    """(title, publisher, favicon) from the cache only, or None. Never touches the network."""
+    entry = metadata_cache.get(canonical_url(target_url), allow_negative=False)
+    if entry:
+        return entry["title"], entry["publisher"], entry["favicon"]
+    return None
+
+def fetch_metadata(target_url: str, allow_negative: bool = True, refresh: bool = False):
+    """(title, publisher, favicon), from the cache unless `refresh`; a fetched result is cached either way."""
+    key = canonical_url(target_url)
+    entry = None if refresh else metadata_cache.get(key, allow_negative=allow_negative)
+    if entry:
+        return entry["title"], entry["publisher"], entry["favicon"]
+
+    with span("fetch_metadata"):
+        title, publisher, favicon_url, source = _fetch_metadata(target_url)
+    metadata_cache.set(key, {"title": title, "publisher": publisher, "favicon": favicon_url, "source": source},
+                       SOURCE_TTLS[source], negative=(source == "none"))
+    return title, publisher, favicon_url
+
+def _wait(future, deadline):
+    """Result of `future` if it finishes before the deadline, else None."""
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except Exception:
+        return None
+
+def _fetch_page(url, cancelled):
+    """GET a page and read its <head>: returns (head, pdf_title) or None."""
+    if cancelled.is_set():
+        return None
+    with span("page_get"):
+        resp = http_get(url, stage="page", headers=HEADERS, stream=True)
+    if resp.status_code >= 400:
+        resp.close()
+        return None
+    ctype = (resp.headers.get("Content-Type") or "").lower()
+    if "application/pdf" in ctype or (is_pdf_url(url) and "html" not in ctype):
+        with span("pdf"):
+            return None, pdf_title_from_response(resp)
+    with span("page_head"):
+        return read_head(resp), None
+
+def _outcome(strategy, provider, hit):
+    strategy_total.inc(strategy=strategy, provider=provider, outcome="hit" if hit else "fail")
+
+def _skip_open(strategy, provider, host):
+    """True (and counted) when `host` has an open circuit, so the strategy isn't even started."""
+    if breakers.is_open(host):
+        strategy_total.inc(strategy=strategy, provider=provider, outcome="circuit_open")
+        return True
+    return False
+
+def _clean(title):
+    return html.unescape(" ".join(title.split())) if title else None
+
+class _FetchPlan:
+    """Which strategies one fetch runs, from provider_utils.route, minus those
+    aimed at hosts whose circuit is open. Shared by the sync and async paths."""
+
+    def __init__(self, target_url):
+        self.url, self.publisher, self.favicon_url = placeholder_metadata(target_url)
+        self.parsed = urlparse(self.url)
+        self.route = plan = route(self.url)
+        self.provider = provider = plan.provider.name
+        self.oembed = OEMBED in plan.strategies
+        self.rewrite = REWRITE in plan.strategies
+        self.doi = plan.doi
+        self.scrape = SCRAPE in plan.strategies or PDF in plan.strategies
+        self.host_icon = cached_host_icon(self.parsed.hostname)
 
-    # Try OEmbed API first
-    oembed_title, oembed_publisher, oembed_icon_url = try_oembed(target_url, publisher)
-    if oembed_title:
-        if not oembed_icon_url:
-            try:
-                resp = requests.get(target_url, headers=HEADERS, timeout=1)
-                if resp and resp.status_code < 400 and resp.text:
-                    soup = BeautifulSoup(resp.text, "html.parser")
-                    favicon_url = resolve_best_icon(resp, soup)
-            except:
-                pass
-        return oembed_title, oembed_publisher, oembed_icon_url or favicon_url
-    # Arxiv.org special case (to get the title from the abstract page)
-    if publisher == "arxiv.org" and "/pdf/" in p.path:
-        target_url = target_url.replace("/pdf/", "/abs/")
-        try:
-            resp = requests.get(target_url, headers=HEADERS, timeout=1)
-            if resp and resp.status_code < 400 and resp.text:
-                soup = BeautifulSoup(resp.text, "html.parser")
-                found = extract_title(soup)
-                if found:
-                    title = html.unescape(" ".join(found.split()))
-        except:
-            pass
+        # Hosts that keep failing are skipped outright; the next strategy in line
+        # (or the URL fallback, which the enrichment queue retries) answers instead.
+        if self.oembed and _skip_open("oembed", provider, urlparse(plan.oembed_url).hostname):
+            self.oembed = False
+        if self.rewrite and _skip_open("rewrite", provider, urlparse(plan.fetch_url).hostname):
+            self.rewrite = False
+        self.doi_open = bool(self.doi) and _skip_open("doi", "crossref", CROSSREF_HOST)
+        page_open = breakers.is_open(self.parsed.hostname)
+        if self.scrape and page_open:
+            _skip_open("scrape", "html", self.parsed.hostname)
+            self.scrape = False
+        # the page GET doubles as the favicon lookup for oEmbed results
+        self.page = self.scrape or (self.oembed and not self.host_icon and not page_open)
+
+    def oembed_result(self, oembed):
+        _outcome("oembed", self.provider, oembed and oembed[0])
+        if oembed and oembed[0]:
+            return oembed[0], oembed[1], oembed[2], "oembed"
+
+    def rewrite_result(self, page):
+        title = page and page[0] is not None and extract_title(page[0])
+        _outcome("rewrite", self.provider, title)
+        if title:
+            return _clean(title), self.publisher, self.favicon_url, "rewrite"
+
+    def doi_result(self, title):
+        if not self.doi_open:
+            _outcome("doi", "crossref", title)
+        return title or self.doi, self.publisher, self.favicon_url, "doi" if title else "none"
+
+    def scrape_result(self, page):
+        if not page:
+            _outcome("scrape", "html", False)
+            return None
+        head, pdf_title = page
+        if head is None:
+            _outcome("scrape", "pdf", pdf_title)
+            if pdf_title:
+                return " ".join(pdf_title.split()), self.publisher, self.favicon_url, "pdf"
+            title = slug_to_title(self.parsed.path, self.publisher)
+            _outcome("slug", "url", title)
+            return title or self.url, self.publisher, self.favicon_url, "slug" if title else "none"
+        title = _clean(extract_title(head))
+        _outcome("scrape", "html", title)
         if title:
-            return title, publisher, favicon_url
-
-    # DOI metadata (Science.org, etc.)
-    doi = extract_doi_from_url(target_url)
-    if doi:
-        title = fetch_doi_metadata(doi)
-        return (title or doi, publisher, favicon_url)
-
-    # Generic HTTP(s) scraping
-    if not any(slug in target_url for slug in PARSEABLE_SLUGS):
-        try:
-            resp = requests.get(target_url, headers=HEADERS, timeout=1)
-        except:
-            resp = None
-
-        if resp and resp.status_code < 400:
-            # PDF title scraping
-            if publisher != "arxiv.org":
-                ctype = (resp.headers.get("Content-Type") or "").lower()
-                if "application/pdf" in ctype or is_pdf_url(target_url):
-                    t = try_pdf_title(resp.content or b"")
-                    return (" ".join(t.split())) if t else (slug_to_title(p.path, publisher) or target_url),
-                    publisher,
-                    favicon_url
-
-            soup = BeautifulSoup(resp.text, "html.parser")
-            found = extract_title(soup)
-            if found:
-                title = html.unescape(" ".join(found.split()))
-            favicon_url = resolve_best_icon(resp, soup)
+            return title, self.publisher, None, "scrape"
+
+    def fallback(self):
+        # slug-based title, or the target URL
+        if SLUG in self.route.strategies:
+            title = slug_to_title(self.parsed.path, self.publisher)
+            _outcome("slug", "url", title)
             if title:
-                return title, publisher, favicon_url
-
-    # final fallback (slug-based title) or target URL
-    if publisher in PARSEABLE_SLUGS:
-        title = slug_to_title(p.path, publisher) or target_url
-    else:
-        title = target_url
-    return title, publisher, favicon_url
\ No newline at end of file
+                return title, self.publisher, self.favicon_url, "slug"
+        return self.url, self.publisher, None, "none"
+
+def _fetch_metadata(target_url: str, deadline: float | None = None):
+    """Run every applicable strategy at once and keep the best title by priority.
+
+    Which strategies apply comes from provider_utils.route. Priority: oEmbed,
+    canonical rewrite (e.g. arXiv PDF -> abstract page), Crossref DOI, page
+    scrape (HTML or PDF), URL slug. The page GET doubles as the favicon lookup, so it starts
+    alongside oEmbed. Nothing waits past `deadline` seconds; once a strategy
+    wins, the ones that have not started are cancelled and late results are
+    ignored.
+    """
+    fp = _FetchPlan(target_url)
+    deadline = time.monotonic() + (deadline or FETCH_DEADLINE)
+    cancelled = threading.Event()
+
+    futures = {}
+    if fp.oembed:
+        futures["oembed"] = _executor.submit(try_oembed, fp.url, fp.publisher)
+    if fp.rewrite:
+        futures["rewrite"] = _executor.submit(_fetch_page, fp.route.fetch_url, cancelled)
+    if fp.doi and not fp.doi_open:
+        futures["doi"] = _executor.submit(fetch_doi_metadata, fp.doi)
+    if fp.page:
+        futures["page"] = _executor.submit(_fetch_page, fp.url, cancelled)
+
+    def finish(result):
+        title, pub, icon, source = result
+        cancelled.set()
+        for name, f in futures.items():
+            if name != "page" or icon:
+                f.cancel()
+        if not icon:
+            icon = fp.host_icon
+        if not icon and source in ("oembed", "scrape", "none") and "page" in futures:
+            page = _wait(futures["page"], deadline)
+            if page and page[0] is not None:
+                icon = resolve_best_icon(page[0])
+        return title, pub, icon or fp.favicon_url, source
+
+    result = None
+    if fp.oembed:
+        result = fp.oembed_result(_wait(futures["oembed"], deadline))
+    if not result and fp.rewrite:
+        result = fp.rewrite_result(_wait(futures["rewrite"], deadline))
+    if not result and fp.doi:
+        result = fp.doi_result(_wait(futures.get("doi"), deadline))
+    if not result and fp.scrape:
+        result = fp.scrape_result(_wait(futures["page"], deadline))
+    return finish(result or fp.fallback())
+
+# ---- asyncio ----
+# The same strategies as tasks on the caller's event loop, so one thread can
+# keep hundreds of fetches in flight (see the enrichment loop in app.py).
+
+async def fetch_metadata_async(target_url: str, allow_negative: bool = True):
+    key = canonical_url(target_url)
+    entry = await asyncio.to_thread(metadata_cache.get, key, allow_negative=allow_negative)
+    if entry:
+        return entry["title"], entry["publisher"], entry["favicon"]
+
+    with span("fetch_metadata"):
+        title, publisher, favicon_url, source = await _fetch_metadata_async(target_url)
+    await asyncio.to_thread(
+        metadata_cache.set, key, {"title": title, "publisher": publisher, "favicon": favicon_url, "source": source},
+        SOURCE_TTLS[source], negative=(source == "none"))
+    return title, publisher, favicon_url
+
+async def _wait_async(task, deadline):
+    if task is None:
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic()))
+    except (Exception, asyncio.CancelledError):
+        if asyncio.current_task().cancelling():
+            raise
+        return None
+
+async def _fetch_page_async(url):
+    with span("page_get"):
+        resp = await http_get_async(url, stage="page", headers=HEADERS, stream=True)
+    if resp.status_code >= 400:
+        await resp.aclose()
+        return None
+    ctype = (resp.headers.get("Content-Type") or "").lower()
+    if "application/pdf" in ctype or (is_pdf_url(url) and "html" not in ctype):
+        with span("pdf"):
+            return None, await pdf_title_from_response_async(resp)
+    with span("page_head"):
+        return await read_head_async(resp), None
+
+async def _fetch_metadata_async(target_url: str, deadline: float | None = None):
+    """_fetch_metadata on asyncio: same strategies, priorities and deadline."""
+    fp = _FetchPlan(target_url)
+    deadline = time.monotonic() + (deadline or FETCH_DEADLINE)
+
+    tasks = {}
+    if fp.oembed:
+        tasks["oembed"] = asyncio.ensure_future(try_oembed_async(fp.url, fp.publisher))
+    if fp.rewrite:
+        tasks["rewrite"] = asyncio.ensure_future(_fetch_page_async(fp.route.fetch_url))
+    if fp.doi and not fp.doi_open:
+        tasks["doi"] = asyncio.ensure_future(fetch_doi_metadata_async(fp.doi))
+    if fp.page:
+        tasks["page"] = asyncio.ensure_future(_fetch_page_async(fp.url))
+
+    try:
+        result = None
+        if fp.oembed:
+            result = fp.oembed_result(await _wait_async(tasks["oembed"], deadline))
+        if not result and fp.rewrite:
+            result = fp.rewrite_result(await _wait_async(tasks["rewrite"], deadline))
+        if not result and fp.doi:
+            result = fp.doi_result(await _wait_async(tasks.get("doi"), deadline))
+        if not result and fp.scrape:
+            result = fp.scrape_result(await _wait_async(tasks["page"], deadline))
+        title, pub, icon, source = result or fp.fallback()
+
+        if not icon:
+            icon = fp.host_icon
+        if not icon and source in ("oembed", "scrape", "none") and "page" in tasks:
+            page = await _wait_async(tasks["page"], deadline)
+            if page and page[0] is not None:
+                icon = await resolve_best_icon_async(page[0])
+        return title, pub, icon or fp.favicon_url, source
+    finally:
+        for t in tasks.values():
+            t.cancel()
@@ -0,0 +1,133 @@
+import bisect, threading, time
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets in seconds, from a cache hit to a fetch hitting its deadline
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_labels(self.labels, key)} {v}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(self.labels + ('le',), key + (bound,))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {row[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {row[-2]:.6f}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {row[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []   # callables yielding extra exposition lines (e.g. cache ratios)
+
+    def counter(self, *args, **kwargs):
+        m = Counter(*args, **kwargs)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, *args, **kwargs):
+        m = Histogram(*args, **kwargs)
+        self.metrics.append(m)
+        return m
+
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        for collect in self.collectors:
+            try:
+                lines.extend(collect())
+            except Exception:
+                pass
+        return "\n".join(lines) + "\n"
+
+
+def sample_lines(name, type_, help, samples):
+    """Exposition lines for values kept elsewhere, from [(labels dict, value)]."""
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {type_}"
+    for labels, value in samples:
+        yield f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "someday_stage_seconds", "Time spent in one stage of a metadata fetch or request", ["stage"])
+strategy_total = registry.counter(
+    "someday_metadata_strategy_total", "Metadata strategy outcomes", ["strategy", "provider", "outcome"])
+
+
+@contextmanager
+def span(stage):
+    """Time the block into someday_stage_seconds{stage=...}, including when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
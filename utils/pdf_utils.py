@@ -1,17 +1,224 @@
 from urllib.parse import urlparse
 from pypdf import PdfReader
-import io
+import asyncio, io, os, re, tempfile, time
+from utils.http_utils import http_get, http_get_async
+
+PDF_TAIL_BYTES = 64 * 1024                                            # one Range request for trailer + xref
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(20 * 1024 * 1024)))  # fallback download cap
+PDF_SPOOL_BYTES = 1024 * 1024                                         # kept in memory before spilling to disk
+PDF_BUDGET = float(os.getenv("PDF_BUDGET", "3"))                      # seconds for the fallback path
 
 def is_pdf_url(url: str) -> bool:
     p = urlparse(url)
     return (p.path or "").lower().endswith(".pdf") or "/pdf/" in (p.path or "")
 
 def try_pdf_title(bytes_data: bytes) -> str | None:
+    return _title_from_file(io.BytesIO(bytes_data))
+
+def _title_from_file(f, first_page_text=False) -> str | None:
     try:
-        reader = PdfReader(io.BytesIO(bytes_data))
+        reader = PdfReader(f)
         docinfo = reader.metadata  # .title available on many PDFs
         if docinfo and docinfo.title:
             return str(docinfo.title).strip()
+        if first_page_text and len(reader.pages):
+            return _guess_title_from_text(reader.pages[0].extract_text() or "")
     except Exception:
         pass
-    return None
\ No newline at end of file
+    return None
+
+def _guess_title_from_text(text: str) -> str | None:
+    # first line that looks like a heading rather than a running header or page number
+    for line in text.splitlines()[:15]:
+        line = " ".join(line.split())
+        if 10 <= len(line) <= 200 and not line.isdigit():
+            return line
+    return None
+
+# ---- trailer / xref / Info parsing from the tail of the file ----
+
+def _pdf_string(raw: bytes) -> str:
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", "replace")
+    return raw.decode("latin-1")
+
+_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+
+def _read_literal(data: bytes, i: int) -> bytes:
+    """Bytes of the literal string starting just after the '(' at data[i-1]."""
+    out, depth = bytearray(), 1
+    while i < len(data):
+        c = data[i]
+        if c == 0x5C:  # backslash
+            i += 1
+            if i >= len(data):
+                break
+            c = data[i]
+            if c in _ESCAPES:
+                out += _ESCAPES[c]
+            elif 0x30 <= c <= 0x37:
+                digits = re.match(rb"[0-7]{1,3}", data[i:i + 3]).group()
+                out.append(int(digits, 8) & 0xFF)
+                i += len(digits) - 1
+            elif c in (0x0A, 0x0D):
+                pass  # line continuation
+            else:
+                out.append(c)
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                break
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    return bytes(out)
+
+def _title_from_info(obj: bytes) -> str | None:
+    m = re.search(rb"/Title\s*(\(|<)", obj)
+    if not m:
+        return None
+    if m.group(1) == b"(":
+        raw = _read_literal(obj, m.end())
+    else:
+        hexstr = re.sub(rb"\s", b"", obj[m.end():obj.find(b">", m.end())])
+        raw = bytes.fromhex((hexstr + b"0" * (len(hexstr) % 2)).decode())
+    title = _pdf_string(raw).strip()
+    return title or None
+
+def _xref_offset(section: bytes, obj_num: int) -> int | None:
+    """Byte offset of obj_num from a classic 'xref' table, or None."""
+    lines = iter(section.split(b"trailer", 1)[0].splitlines()[1:])
+    for line in lines:
+        head = line.split()
+        if len(head) != 2:
+            continue
+        start, count = int(head[0]), int(head[1])
+        for n in range(start, start + count):
+            entry = next(lines, b"").split()
+            if n == obj_num and len(entry) == 3 and entry[2] == b"n":
+                return int(entry[0])
+    return None
+
+def _parse_tail(tail: bytes, size: int):
+    """(Info object bytes, None) when the tail holds it, (None, offset) when it must be
+    fetched from `offset`, or (None, None) when only pypdf can tell."""
+    tail_start = size - len(tail)
+    startxref = tail.rfind(b"startxref")
+    trailer = tail.rfind(b"trailer", 0, startxref if startxref >= 0 else None)
+    if startxref < 0 or trailer < 0 or b"/Encrypt" in tail[trailer:]:
+        return None, None  # xref streams and encrypted files go through pypdf
+    info = re.search(rb"/Info\s+(\d+)\s+\d+\s+R", tail[trailer:])
+    xref_at = re.match(rb"\s*(\d+)", tail[startxref + 9:])
+    if not info or not xref_at or int(xref_at.group(1)) < tail_start:
+        return None, None
+    offset = _xref_offset(tail[int(xref_at.group(1)) - tail_start:], int(info.group(1)))
+    if offset is None:
+        return None, None
+    if offset >= tail_start:
+        return tail[offset - tail_start:], None
+    return None, offset
+
+def _info_title(obj: bytes) -> str | None:
+    return _title_from_info(obj[:obj.find(b"endobj")] if b"endobj" in obj else obj)
+
+def _total_size(r):
+    total = re.search(r"/(\d+)$", r.headers.get("Content-Range", ""))
+    return int(total.group(1)) if r.status_code == 206 and total else None
+
+def _title_from_tail(url: str) -> str | None:
+    """Read /Title via Range requests: the tail for trailer + xref, then the Info object."""
+    with http_get(url, stage="pdf", headers={"Range": f"bytes=-{PDF_TAIL_BYTES}"}, stream=True) as r:
+        size = _total_size(r)
+        if size is None:
+            return None  # server ignored the Range header; don't download the whole body
+        tail = r.raw.read(PDF_TAIL_BYTES + 1, decode_content=True)
+    obj, offset = _parse_tail(tail, size)
+    if offset is not None:
+        with http_get(url, stage="pdf", headers={"Range": f"bytes={offset}-{offset + 4095}"}, stream=True) as r:
+            if r.status_code != 206:
+                return None
+            obj = r.raw.read(4096, decode_content=True)
+    return _info_title(obj) if obj else None
+
+def _title_from_stream(resp) -> str | None:
+    """Spool a capped download (memory, then a temp file) and let pypdf read it."""
+    deadline = time.monotonic() + PDF_BUDGET
+    with tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES) as f:
+        read = 0
+        for chunk in resp.iter_content(64 * 1024):
+            read += len(chunk)
+            if read > PDF_MAX_BYTES or time.monotonic() > deadline:
+                return None
+            f.write(chunk)
+        f.seek(0)
+        return _title_from_file(f, first_page_text=time.monotonic() < deadline)
+
+def pdf_title_from_response(resp) -> str | None:
+    """Title of the PDF behind a streamed response, without holding the whole file in memory."""
+    try:
+        try:
+            title = _title_from_tail(resp.url)
+        except Exception:
+            title = None   # Range request failed or an odd xref: read the stream instead
+        return title or _title_from_stream(resp)
+    except Exception:
+        return None
+    finally:
+        resp.close()
+
+# ---- asyncio versions, for httpx responses (see http_utils.http_get_async) ----
+
+async def _read_async(r, n: int) -> bytes:
+    buf = b""
+    async for chunk in r.aiter_bytes():
+        buf += chunk
+        if len(buf) >= n:
+            break
+    return buf[:n]
+
+async def _range_async(url: str, range_header: str, n: int):
+    r = await http_get_async(url, stage="pdf", headers={"Range": range_header}, stream=True)
+    try:
+        if r.status_code != 206:
+            return None, None
+        return _total_size(r), await _read_async(r, n)
+    finally:
+        await r.aclose()
+
+async def _title_from_tail_async(url: str) -> str | None:
+    size, tail = await _range_async(url, f"bytes=-{PDF_TAIL_BYTES}", PDF_TAIL_BYTES + 1)
+    if size is None:
+        return None
+    obj, offset = _parse_tail(tail, size)
+    if offset is not None:
+        _, obj = await _range_async(url, f"bytes={offset}-{offset + 4095}", 4096)
+    return _info_title(obj) if obj else None
+
+async def _title_from_stream_async(resp) -> str | None:
+    deadline = time.monotonic() + PDF_BUDGET
+    with tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES) as f:
+        read = 0
+        async for chunk in resp.aiter_bytes(64 * 1024):
+            read += len(chunk)
+            if read > PDF_MAX_BYTES or time.monotonic() > deadline:
+                return None
+            f.write(chunk)
+        f.seek(0)
+        # pypdf is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(_title_from_file, f, time.monotonic() < deadline)
+
+async def pdf_title_from_response_async(resp) -> str | None:
+    try:
+        try:
+            title = await _title_from_tail_async(str(resp.url))
+        except Exception:
+            title = None
+        return title or await _title_from_stream_async(resp)
+    except Exception:
+        return None
+    finally:
+        await resp.aclose()
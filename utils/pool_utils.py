@@ -0,0 +1,69 @@
+import asyncio, threading, time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+def host_of(url):
+    return (urlparse(url if "://" in url else "https://" + url).hostname or "").lower()
+
+
+class HostLimiter:
+    """At most `per_host` concurrent slots per host, shared by every thread."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._sems = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+
+    def _sem(self, host):
+        with self._lock:
+            return self._sems[host]
+
+    def acquire(self, host, timeout=None):
+        return self._sem(host).acquire(timeout=timeout)
+
+    def release(self, host):
+        self._sem(host).release()
+
+
+def map_bounded(fn, urls, workers=8, per_host=2, interval=0):
+    """Run fn(url) for every url with `workers` threads and at most `per_host`
+    in flight per host. With `interval`, each call keeps its host slot for at
+    least that many seconds, which rate-limits a host to per_host/interval
+    calls a second. Yields (url, result, error) in the order of `urls`."""
+    limiter = HostLimiter(per_host)
+
+    def run(url):
+        host = host_of(url)
+        limiter.acquire(host)
+        start = time.monotonic()
+        try:
+            return url, fn(url), None
+        except Exception as e:
+            return url, None, e
+        finally:
+            if interval:
+                time.sleep(max(0.0, interval - (time.monotonic() - start)))
+            limiter.release(host)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, u) for u in urls]
+        for f in futures:
+            yield f.result()
+
+
+async def map_bounded_async(fn, urls, concurrency=8, per_host=2):
+    """map_bounded for a coroutine function on the running event loop.
+    Returns [(url, result, error)] in the order of `urls`."""
+    slots = asyncio.Semaphore(concurrency)
+    hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    async def run(url):
+        async with hosts[host_of(url)], slots:
+            try:
+                return url, await fn(url), None
+            except Exception as e:
+                return url, None, e
+
+    return await asyncio.gather(*(run(u) for u in urls))
@@ -0,0 +1,173 @@
+"""Publisher routing: which metadata strategies to run for a URL, and in what order.
+
+Providers are matched on the host by a suffix trie over DNS labels (so
+"m.youtube.com" is YouTube and "notyoutube.com" is not), then on the path by
+precompiled regexes. Extra providers can be loaded from a JSON file named by
+PROVIDERS_FILE, a list of objects with the same keys as BUILTIN_PROVIDERS;
+a provider with the same name as a built-in one replaces it.
+"""
+import json, os, re
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import parse_qsl, quote, urlparse
+
+import tldextract
+
+# Strategy names, in the priority order fetch_metadata applies them
+OEMBED, REWRITE, DOI, PDF, SCRAPE, SLUG = "oembed", "rewrite", "doi", "pdf", "scrape", "slug"
+
+DOI_PATH = re.compile(r"/doi/(?:abs/|full/|pdf/|suppl/)?(10\.\d{4,9}/[^\s/]+)")
+PDF_PATH = re.compile(r"(\.pdf$)|(/pdf/)", re.IGNORECASE)
+
+BUILTIN_PROVIDERS = [
+    # oembed_style picks how try_oembed turns the response into a title
+    {"name": "spotify", "hosts": ["open.spotify.com"],
+     "oembed": "https://open.spotify.com/oembed?url={url}", "oembed_style": "spotify"},
+    # canonical_host / canonical / keep_params shape the dedup key (see cache_utils.canonical_url)
+    {"name": "youtube", "hosts": ["youtube.com"],
+     "oembed": "https://www.youtube.com/oembed?url={url}&format=json",
+     "canonical_host": "youtube.com", "canonical": [[r"^/shorts/([\w-]+)$", "/watch?v=\\1"]],
+     "keep_params": ["v", "list"]},
+    {"name": "youtu.be", "hosts": ["youtu.be"],
+     "oembed": "https://www.youtube.com/oembed?url={url}&format=json",
+     "canonical_host": "youtube.com", "canonical": [[r"^/([\w-]+)$", "/watch?v=\\1"]],
+     "keep_params": ["v", "list"]},
+    {"name": "twitter", "hosts": ["twitter.com"],
+     "oembed": "https://publish.twitter.com/oembed?url={url}", "oembed_style": "tweet"},
+    {"name": "x", "hosts": ["x.com"], "oembed": "https://publish.twitter.com/oembed?url={url}",
+     "oembed_style": "tweet", "scrape": False, "slug": True},
+    {"name": "vimeo", "hosts": ["vimeo.com"], "oembed": "https://vimeo.com/api/oembed.json?url={url}"},
+    {"name": "soundcloud", "hosts": ["soundcloud.com"], "oembed": "https://soundcloud.com/oembed?url={url}&format=json"},
+    {"name": "reddit", "hosts": ["reddit.com"], "oembed": "https://www.reddit.com/oembed?url={url}&format=json",
+     "oembed_style": "reddit"},
+    # arXiv PDFs: read the title from the abstract page instead
+    {"name": "arxiv", "hosts": ["arxiv.org"], "rewrites": [[r"^/pdf/(.+?)(?:\.pdf)?$", r"/abs/\1"]],
+     "canonical": [[r"^/pdf/(.+?)(?:\.pdf)?$", r"/abs/\1"]]},
+    # paywalled or script-rendered pages: the URL slug is the best title we get
+    {"name": "wsj", "hosts": ["wsj.com"], "scrape": False, "slug": True, "slug_trim": True},
+    {"name": "washingtonpost", "hosts": ["washingtonpost.com"], "scrape": False, "slug": True},
+    {"name": "facebook", "hosts": ["facebook.com"], "scrape": False, "slug": True},
+    {"name": "medium", "hosts": ["medium.com"], "slug_trim": True},
+]
+
+
+class Provider:
+    def __init__(self, name, hosts, oembed=None, oembed_style="title_by_author", rewrites=(),
+                 scrape=True, slug=False, slug_trim=False, canonical_host=None, canonical=(), keep_params=None):
+        self.name = name
+        self.hosts = [h.lower() for h in hosts]
+        self.oembed = oembed
+        self.oembed_style = oembed_style
+        self.rewrites = [(re.compile(pattern), repl) for pattern, repl in rewrites]
+        self.scrape = scrape
+        self.slug = slug            # fall back to the URL slug when nothing better is found
+        self.slug_trim = slug_trim  # slugs end in an id token that is not part of the title
+        self.canonical_host = canonical_host
+        self.canonical = [(re.compile(pattern), repl) for pattern, repl in canonical]
+        self.keep_params = set(keep_params) if keep_params is not None else None
+
+    def __repr__(self):
+        return f"Provider({self.name!r})"
+
+
+DEFAULT = Provider("default", [])
+
+# plan.strategies is the ordered tuple of strategy names to run
+RoutePlan = namedtuple("RoutePlan", "provider strategies oembed_url fetch_url doi")
+
+
+class ProviderRegistry:
+    def __init__(self, providers=()):
+        self._trie = {}
+        self.providers = {}
+        for p in providers:
+            self.add(p)
+
+    def add(self, provider):
+        old = self.providers.get(provider.name)
+        if old:
+            for host in old.hosts:
+                self._node(host).pop(None, None)
+        self.providers[provider.name] = provider
+        for host in provider.hosts:
+            self._node(host)[None] = provider
+
+    def _node(self, host):
+        node = self._trie
+        for label in reversed(host.split(".")):
+            node = node.setdefault(label, {})
+        return node
+
+    def for_host(self, host):
+        """The provider with the longest matching host suffix, or DEFAULT."""
+        node, found = self._trie, DEFAULT
+        for label in reversed((host or "").lower().rstrip(".").split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+    def route(self, url):
+        p = urlparse(url)
+        provider = self.for_host(p.hostname)
+        path = p.path or "/"
+        strategies = []
+        oembed_url = fetch_url = doi = None
+
+        if provider.oembed:
+            strategies.append(OEMBED)
+            oembed_url = provider.oembed.format(url=quote(url, safe=""))
+        for pattern, repl in provider.rewrites:
+            if pattern.search(path):
+                strategies.append(REWRITE)
+                fetch_url = p._replace(path=pattern.sub(repl, path)).geturl()
+                break
+        m = DOI_PATH.search(path)
+        if m:
+            strategies.append(DOI)
+            doi = m.group(1)
+        elif REWRITE not in strategies and provider.scrape:
+            strategies.append(PDF if PDF_PATH.search(path) else SCRAPE)
+        if provider.slug:
+            strategies.append(SLUG)
+        return RoutePlan(provider, tuple(strategies), oembed_url, fetch_url, doi)
+
+    def canonical(self, host, path, query):
+        """Provider-specific (host, path, query pairs) for the dedup key."""
+        provider = self.for_host(host)
+        for pattern, repl in provider.canonical:
+            if pattern.search(path):
+                path, _, extra = pattern.sub(repl, path).partition("?")
+                query = [q for q in query if q[0] not in dict(parse_qsl(extra))] + parse_qsl(extra)
+                break
+        if provider.keep_params is not None:
+            query = [q for q in query if q[0] in provider.keep_params]
+        return provider.canonical_host or host, path, query
+
+
+# the Public Suffix List snapshot bundled with tldextract; never fetched at runtime
+_suffixes = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None, include_psl_private_domains=True)
+
+@lru_cache(maxsize=4096)
+def registrable_domain(host):
+    """Like site_of, but None for a public suffix, an IP or a bare name."""
+    return _suffixes(host or "").top_domain_under_public_suffix or None
+
+def site_of(host):
+    """Registrable domain of a host (news.bbc.co.uk -> bbc.co.uk); IPs and bare names are their own site."""
+    return registrable_domain(host) or host
+
+
+def load_providers(path):
+    with open(path) as f:
+        return [Provider(**entry) for entry in json.load(f)]
+
+
+registry = ProviderRegistry(Provider(**entry) for entry in BUILTIN_PROVIDERS)
+if os.getenv("PROVIDERS_FILE"):
+    for _provider in load_providers(os.environ["PROVIDERS_FILE"]):
+        registry.add(_provider)
+
+route = registry.route
+provider_for_host = registry.for_host
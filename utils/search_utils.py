@@ -0,0 +1,115 @@
+import re
+
+from sqlalchemy import text
+
+SEARCH_PAGE_SIZE = 20
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Alembic filter: the search objects are created by hand, not from the models."""
+    if type_ == "table" and name.startswith("articles_fts"):
+        return False   # the FTS5 table and its shadow tables
+    if (type_ == "column" and name == "search_vector") or (type_ == "index" and name == "ix_articles_search"):
+        return False
+    return True
+
+
+def _terms(q):
+    return re.findall(r"\w+", q or "")[:16]
+
+
+class SQLiteSearch:
+    """FTS5 table kept in sync by triggers. An `owner` column holding "u<user_id>"
+    lets the match itself scope results to one user instead of filtering after."""
+
+    DDL = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+               owner, title, publisher, url, tokenize = 'unicode61')""",
+        """CREATE TRIGGER IF NOT EXISTS articles_fts_ai AFTER INSERT ON articles BEGIN
+               INSERT INTO articles_fts(rowid, owner, title, publisher, url)
+               VALUES (new.id, 'u' || new.user_id, new.title, new.publisher, new.url);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS articles_fts_ad AFTER DELETE ON articles BEGIN
+               DELETE FROM articles_fts WHERE rowid = old.id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS articles_fts_au AFTER UPDATE OF title, publisher, url ON articles BEGIN
+               UPDATE articles_fts SET title = new.title, publisher = new.publisher, url = new.url
+               WHERE rowid = new.id;
+           END""",
+    ]
+    BACKFILL = """INSERT INTO articles_fts(rowid, owner, title, publisher, url)
+                  SELECT id, 'u' || user_id, title, publisher, url FROM articles
+                  WHERE id NOT IN (SELECT rowid FROM articles_fts)"""
+    DROP = ["DROP TRIGGER IF EXISTS articles_fts_ai", "DROP TRIGGER IF EXISTS articles_fts_ad",
+            "DROP TRIGGER IF EXISTS articles_fts_au", "DROP TABLE IF EXISTS articles_fts"]
+
+    def install(self, conn):
+        for stmt in self.DDL:
+            conn.execute(text(stmt))
+        conn.execute(text(self.BACKFILL))
+
+    def uninstall(self, conn):
+        for stmt in self.DROP:
+            conn.execute(text(stmt))
+
+    def search(self, conn, user_id, q, limit, offset=0):
+        """[(article_id, rank)] best first."""
+        terms = _terms(q)
+        if not terms:
+            return []
+        words = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        match = f'owner : "u{int(user_id)}" AND {{title publisher url}} : ({words.strip()})'
+        rows = conn.execute(text(
+            "SELECT rowid, bm25(articles_fts, 0, 10.0, 2.0, 1.0) AS rank FROM articles_fts "
+            "WHERE articles_fts MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset})
+        return [(r.rowid, r.rank) for r in rows]
+
+
+class PostgresSearch:
+    """A stored generated tsvector column with a (user_id, search_vector) GIN index."""
+
+    DDL = [
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        """ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_vector tsvector
+           GENERATED ALWAYS AS (
+               setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(publisher, '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce(url, '')), 'C')
+           ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_articles_search ON articles USING gin (user_id, search_vector)",
+    ]
+    DROP = ["DROP INDEX IF EXISTS ix_articles_search",
+            "ALTER TABLE articles DROP COLUMN IF EXISTS search_vector"]
+
+    def install(self, conn):
+        for stmt in self.DDL:
+            conn.execute(text(stmt))
+
+    def uninstall(self, conn):
+        for stmt in self.DROP:
+            conn.execute(text(stmt))
+
+    def search(self, conn, user_id, q, limit, offset=0):
+        terms = _terms(q)
+        if not terms:
+            return []
+        # prefix-match the last word so results show up while typing
+        params = {f"t{i}": t for i, t in enumerate(terms[:-1] + [terms[-1] + ":*"])}
+        # title lexemes are English stems, publisher/url ones are not: each word
+        # may match either form, and an English stopword (empty there, and
+        # missing from titles) drops out of the query
+        query = " && ".join(
+            f"(CASE WHEN numnode(to_tsquery('english', :{k})) = 0 THEN to_tsquery('english', :{k}) "
+            f"ELSE to_tsquery('english', :{k}) || to_tsquery('simple', :{k}) END)" for k in params)
+        rows = conn.execute(text(
+            "SELECT id, ts_rank_cd(search_vector, s.q) AS rank "
+            f"FROM articles CROSS JOIN (SELECT {query} AS q) AS s "
+            "WHERE user_id = :user_id AND search_vector @@ s.q "
+            "ORDER BY rank DESC, id DESC LIMIT :limit OFFSET :offset"
+        ), {**params, "user_id": user_id, "limit": limit, "offset": offset})
+        return [(r.id, r.rank) for r in rows]
+
+
+def backend_for(dialect_name):
+    return PostgresSearch() if dialect_name == "postgresql" else SQLiteSearch()